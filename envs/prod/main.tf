@@ -824,6 +824,7 @@ module "websocket_lambda" {
   name                  = local.name
   connections_table_name = "${local.name}-websocket-connections"
   lambda_source_file    = var.websocket_lambda_source_file
+  lambda_source_dir     = var.websocket_lambda_source_dir
   lambda_requirements_file = var.websocket_lambda_requirements_file
   # Use the same dynamically determined backend URL as HTTP API Gateway
   # Priority: var.websocket_backend_url > local.backend_url (auto-fetched) > fallback
@@ -865,6 +866,21 @@ resource "aws_apigatewayv2_route" "default" {
   target    = "integrations/${aws_apigatewayv2_integration.websocket.id}"
 }
 
+# ping route (heartbeats: {"action": "ping"}) - two-way, the Lambda's return body is
+# sent back to the client, so a pong costs no DynamoDB, backend or PostToConnection call
+resource "aws_apigatewayv2_route" "ping" {
+  api_id                              = aws_apigatewayv2_api.websocket.id
+  route_key                           = "ping"
+  route_response_selection_expression = "$default"
+  target                              = "integrations/${aws_apigatewayv2_integration.websocket.id}"
+}
+
+resource "aws_apigatewayv2_route_response" "ping" {
+  api_id             = aws_apigatewayv2_api.websocket.id
+  route_id           = aws_apigatewayv2_route.ping.id
+  route_response_key = "$default"
+}
+
 # API Gateway WebSocket Integration
 resource "aws_apigatewayv2_integration" "websocket" {
   api_id           = aws_apigatewayv2_api.websocket.id
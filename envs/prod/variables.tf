@@ -499,6 +499,12 @@ variable "websocket_lambda_source_file" {
   default     = "../../lambda/websocket_proxy.py"
 }
 
+variable "websocket_lambda_source_dir" {
+  description = "Optional bundle directory built by lambda/tools/build_bundle.py (handler, import closure and precompiled bytecode). Relative path from envs/prod directory. When set it is deployed instead of websocket_lambda_source_file"
+  type        = string
+  default     = null
+}
+
 variable "websocket_lambda_requirements_file" {
   description = "Path to requirements.txt file for Lambda dependencies. Relative path from envs/prod directory. Defaults to lambda/requirements.txt in infra repo."
   type        = string
@@ -12,6 +12,7 @@ import urllib.request
 import urllib.error
 import urllib.parse
 import logging
+from botocore.config import Config
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -20,6 +21,14 @@ logger.setLevel(logging.INFO)
 BACKEND_URL = os.environ.get('BACKEND_URL', 'http://44.206.238.155:8000')
 CONNECTIONS_TABLE = os.environ.get('CONNECTIONS_TABLE', 'websocket-connections')
 
+# HTTPS connection pool size for the API Gateway Management API client
+APIGW_MAX_POOL_CONNECTIONS = int(os.environ.get('APIGW_MAX_POOL_CONNECTIONS', '10'))
+
+# Backend call timeout; cut short when less is left of the invocation than the call plus
+# BACKEND_FANOUT_RESERVE_MS (kept back for sending the result to clients)
+BACKEND_TIMEOUT_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_SECONDS', '5'))
+BACKEND_FANOUT_RESERVE_MS = int(os.environ.get('BACKEND_FANOUT_RESERVE_MS', '1000'))
+
 # Get AWS region from boto3 session (AWS_REGION is reserved and auto-set by Lambda)
 try:
     AWS_REGION = boto3.Session().region_name or 'us-east-1'
@@ -30,6 +39,13 @@ except Exception:
 # Will be initialized with endpoint URL when API Gateway endpoint is available
 apigw_management = None
 
+# Lambda context of the current invocation (remaining time bounds backend calls)
+lambda_context = None
+
+# Management API clients by endpoint URL - reused across warm invocations so endpoint
+# resolution, service model loading and the HTTPS connection pool aren't redone per event
+apigw_clients = {}
+
 # DynamoDB client for connection tracking
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
 connections_table = None
@@ -49,6 +65,9 @@ def lambda_handler(event, context):
     domain_name = event.get('requestContext', {}).get('domainName')
     stage = event.get('requestContext', {}).get('stage')
     
+    global lambda_context
+    lambda_context = context
+    
     # Initialize API Gateway Management API client
     global apigw_management
     
@@ -57,16 +76,10 @@ def lambda_handler(event, context):
     if not api_endpoint and domain_name and stage:
         api_endpoint = f"https://{domain_name}/{stage}"
     
-    # Initialize client - always recreate to ensure correct endpoint
-    # (client is lightweight, so this is safe and avoids config access issues)
+    # Reuse the cached client for this endpoint (created on first use per container)
     if api_endpoint:
         try:
-            apigw_management = boto3.client(
-                'apigatewaymanagementapi',
-                endpoint_url=api_endpoint,
-                region_name=AWS_REGION
-            )
-            logger.info(f"Initialized API Gateway Management API client with endpoint: {api_endpoint}")
+            apigw_management = get_apigw_management_client(api_endpoint)
         except Exception as e:
             logger.error(f"Failed to initialize API Gateway Management API client: {e}")
             apigw_management = None
@@ -180,13 +193,13 @@ def handle_connect(event, connection_id):
                 logger.info(f"Response data keys: {list(response_data.keys())}")
                 if response_data.get('initial'):
                     logger.info(f"Sending initial history to connection {connection_id}")
-                    send_to_client(connection_id, response_data['initial'])
+                    send_to_client(connection_id, response_data['initial'], booking_id=booking_id)
                     logger.info(f"Successfully sent initial history to {connection_id}")
                 else:
                     logger.warning(f"No 'initial' key in response data: {response_data}")
                 if response_data.get('receipt'):
                     logger.info(f"Sending receipt updates to connection {connection_id}")
-                    send_to_client(connection_id, response_data['receipt'])
+                    send_to_client(connection_id, response_data['receipt'], booking_id=booking_id)
             else:
                 error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
                 logger.error(f"Backend call failed or invalid response: {error_msg}")
@@ -209,7 +222,7 @@ def handle_connect(event, connection_id):
             if backend_response and backend_response.get('response'):
                 response_data = backend_response['response']
                 if response_data.get('initial'):
-                    send_to_client(connection_id, response_data['initial'])
+                    send_to_client(connection_id, response_data['initial'], booking_id=f"user_{user_id}")
         except Exception as e:
             logger.warning(f"Failed to get initial notifications from backend: {e}")
             # Still accept connection
@@ -336,14 +349,18 @@ def handle_message(event, connection_id):
                     
                     # Send to all connections (including sender - they'll handle duplicates on frontend)
                     broadcast_count = 0
+                    gone_connection_ids = []
                     for conn_id in all_connection_ids:
                         try:
-                            send_to_client(conn_id, response_data)
+                            post_to_client(conn_id, response_data)
                             broadcast_count += 1
+                        except apigw_management.exceptions.GoneException:
+                            gone_connection_ids.append(conn_id)
                         except Exception as e:
                             logger.error(f"Failed to send to connection {conn_id}: {e}")
-                            # Connection might be dead, remove it
-                            remove_connection(conn_id, booking_id)
+                    
+                    # Connections are dead, remove them in one batch (keys are already known)
+                    remove_connections_batch([(booking_id, conn_id) for conn_id in gone_connection_ids])
                     
                     logger.info(f"Broadcast complete: sent to {broadcast_count}/{len(all_connection_ids)} connections")
                 elif connection_type == 'notification' and response_data.get('user_id'):
@@ -353,22 +370,26 @@ def handle_message(event, connection_id):
                     logger.info(f"Broadcasting to {len(all_connection_ids)} notification connections for user {user_id}")
                     
                     broadcast_count = 0
+                    gone_connection_ids = []
                     for conn_id in all_connection_ids:
                         try:
-                            send_to_client(conn_id, response_data)
+                            post_to_client(conn_id, response_data)
                             broadcast_count += 1
+                        except apigw_management.exceptions.GoneException:
+                            gone_connection_ids.append(conn_id)
                         except Exception as e:
                             logger.error(f"Failed to send to connection {conn_id}: {e}")
-                            # Connection might be dead, remove it
-                            remove_connection(conn_id, f"user_{user_id}")
+                    
+                    # Connections are dead, remove them in one batch (keys are already known)
+                    remove_connections_batch([(f"user_{user_id}", conn_id) for conn_id in gone_connection_ids])
                     
                     logger.info(f"Broadcast complete: sent to {broadcast_count}/{len(all_connection_ids)} notification connections")
                 else:
                     # Send response back to sender only
-                    send_to_client(connection_id, response_data)
+                    send_to_client(connection_id, response_data, booking_id=booking_id)
             else:
                 # Send response back to sender only
-                send_to_client(connection_id, response_data)
+                send_to_client(connection_id, response_data, booking_id=booking_id)
         
         return {
             'statusCode': 200
@@ -383,11 +404,32 @@ def handle_message(event, connection_id):
         }
 
 
+def backend_timeout():
+    """
+    Timeout for the next backend call: BACKEND_TIMEOUT_SECONDS, or less if the invocation
+    would otherwise run out of time before the result could be sent.
+    
+    Returns:
+        Seconds, or None if no time is left for the call
+    """
+    if lambda_context is None or not hasattr(lambda_context, 'get_remaining_time_in_millis'):
+        return BACKEND_TIMEOUT_SECONDS
+    remaining = (lambda_context.get_remaining_time_in_millis() - BACKEND_FANOUT_RESERVE_MS) / 1000.0
+    if remaining <= 0:
+        return None
+    return min(BACKEND_TIMEOUT_SECONDS, remaining)
+
+
 def forward_to_backend(url, data):
     """
     Forward message to backend HTTP endpoint.
     Uses urllib instead of requests (which isn't available in Lambda by default).
     """
+    timeout = backend_timeout()
+    if timeout is None:
+        logger.error(f"Backend call skipped: no time left before the invocation deadline, URL: {url}")
+        return {'success': False, 'error': 'Invocation deadline reached before backend call'}
+    
     try:
         # Prepare the request
         json_data = json.dumps(data).encode('utf-8')
@@ -398,8 +440,8 @@ def forward_to_backend(url, data):
             method='POST'
         )
         
-        # Make the request with timeout
-        with urllib.request.urlopen(req, timeout=5) as response:
+        # Make the request with timeout (bounded by the invocation's remaining time)
+        with urllib.request.urlopen(req, timeout=timeout) as response:
             response_data = response.read().decode('utf-8')
             status_code = response.getcode()
             
@@ -425,9 +467,35 @@ def forward_to_backend(url, data):
         return {'success': False, 'error': str(e)}
 
 
-def send_to_client(connection_id, data):
+def get_apigw_management_client(endpoint_url: str):
     """
-    Send message to client via API Gateway Management API.
+    Get (or create once per container) the API Gateway Management API client for an endpoint.
+    
+    Args:
+        endpoint_url: https://{domain}/{stage} of the WebSocket API
+    
+    Returns:
+        boto3 apigatewaymanagementapi client
+    """
+    client = apigw_clients.get(endpoint_url)
+    if client is None:
+        client = boto3.client(
+            'apigatewaymanagementapi',
+            endpoint_url=endpoint_url,
+            region_name=AWS_REGION,
+            config=Config(max_pool_connections=APIGW_MAX_POOL_CONNECTIONS)
+        )
+        apigw_clients[endpoint_url] = client
+        logger.info(f"Initialized API Gateway Management API client with endpoint: {endpoint_url}, max_pool_connections={APIGW_MAX_POOL_CONNECTIONS}")
+    return client
+
+
+def post_to_client(connection_id, data):
+    """
+    Send message to client via API Gateway Management API, re-raising GoneException.
+    
+    Used by the broadcast loops: they know each recipient's row key, so they collect the
+    gone connections and remove them in one batch afterwards. Other errors are logged.
     """
     global apigw_management
     
@@ -442,27 +510,54 @@ def send_to_client(connection_id, data):
         )
         logger.info(f"Sent message to connection {connection_id}")
     except apigw_management.exceptions.GoneException:
-        logger.warning(f"Connection {connection_id} is gone - removing from DynamoDB")
+        logger.warning(f"Connection {connection_id} is gone")
+        raise
+    except Exception as e:
+        logger.error(f"Failed to send message to connection {connection_id}: {e}", exc_info=True)
+
+
+def send_to_client(connection_id, data, booking_id: str = None):
+    """
+    Send message to client via API Gateway Management API.
+    A gone connection is removed from DynamoDB; nothing is raised.
+    
+    Args:
+        connection_id: API Gateway connection ID
+        data: JSON-serializable payload
+        booking_id: The connection's partition key if known (direct delete instead of a table scan)
+    """
+    try:
+        post_to_client(connection_id, data)
+    except apigw_management.exceptions.GoneException:
         # Try to remove the connection from DynamoDB
         try:
-            remove_connection(connection_id, booking_id=None)
+            remove_connection(connection_id, booking_id=booking_id)
         except Exception as cleanup_error:
             logger.warning(f"Failed to cleanup connection {connection_id}: {cleanup_error}")
-    except Exception as e:
-        logger.error(f"Failed to send message to connection {connection_id}: {e}", exc_info=True)
 
 
 # Helper function to broadcast messages (can be called from backend)
-def broadcast_message(connection_ids, data):
+def broadcast_message(connection_ids, data, booking_id: str = None):
     """
     Broadcast message to multiple connections.
     Can be called from your backend via boto3 if needed.
+    
+    Pass booking_id (the partition key all connection_ids are stored under) when it is
+    known: gone connections are then removed in one batch instead of one scan each.
     """
+    gone_connection_ids = []
     for connection_id in connection_ids:
         try:
-            send_to_client(connection_id, data)
+            if booking_id:
+                post_to_client(connection_id, data)
+            else:
+                send_to_client(connection_id, data)
+        except apigw_management.exceptions.GoneException:
+            gone_connection_ids.append(connection_id)
         except Exception as e:
             logger.error(f"Failed to broadcast to {connection_id}: {e}")
+    
+    remove_connections_batch([(booking_id, conn_id) for conn_id in gone_connection_ids])
 
 
 # DynamoDB connection tracking functions
@@ -472,10 +567,10 @@ def get_connections_table():
     global connections_table
     if connections_table is None:
         try:
+            # No describe_table probe (a control-plane call on every cold start) - the
+            # first real read/write surfaces access errors, which callers already log
             connections_table = dynamodb.Table(CONNECTIONS_TABLE)
-            # Test access by describing the table
-            connections_table.meta.client.describe_table(TableName=CONNECTIONS_TABLE)
-            logger.info(f"Connected to DynamoDB table: {CONNECTIONS_TABLE}")
+            logger.info(f"Using DynamoDB table: {CONNECTIONS_TABLE}")
         except Exception as e:
             logger.warning(f"DynamoDB table {CONNECTIONS_TABLE} not accessible: {e}")
             return None
@@ -569,6 +664,36 @@ def remove_connection(connection_id: str, booking_id: str = None):
         logger.error(f"Failed to remove connection from DynamoDB: {e}")
 
 
+def remove_connections_batch(keys):
+    """
+    Remove many WebSocket connections from DynamoDB with BatchWriteItem.
+    
+    Args:
+        keys: List of (booking_id, connection_id) tuples
+    """
+    if not keys:
+        return
+    
+    table = get_connections_table()
+    if not table:
+        logger.warning("DynamoDB table not available, skipping connection removal")
+        return
+    
+    try:
+        # batch_writer sends BatchWriteItem requests of up to 25 deletes and retries unprocessed items
+        with table.batch_writer(overwrite_by_pkeys=['booking_id', 'connection_id']) as batch:
+            for booking_id, connection_id in keys:
+                batch.delete_item(
+                    Key={
+                        'booking_id': str(booking_id),
+                        'connection_id': connection_id
+                    }
+                )
+        logger.info(f"Removed {len(keys)} gone connections")
+    except Exception as e:
+        logger.error(f"Failed to batch remove connections from DynamoDB: {e}")
+
+
 def get_connection_ids_for_booking(booking_id: str, connection_type: str = 'chat'):
     """
     Get all connection IDs for a given booking_id.
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Backfill type_key ("<connection_type>#<connection_id>") on connection rows written
+before the type_key-index existed, so RECIPIENT_KEY_MODE can be switched from
+"legacy" to "typed" without waiting for those rows to expire (24h TTL).
+
+Scans the table once and issues one conditional UpdateItem per row missing
+type_key. The condition keeps a row deleted by $disconnect mid-run from being
+recreated as a key-only stub. Safe to re-run.
+
+Usage:
+    python lambda/tools/backfill_type_key.py --table websocket-connections --dry-run
+    python lambda/tools/backfill_type_key.py --table websocket-connections --region us-east-1
+"""
+import argparse
+import os
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+def backfill(table, dry_run=False):
+    """Set type_key on every row that lacks it. Returns (scanned, updated, skipped) counts."""
+    scanned = updated = skipped = 0
+    scan_kwargs = {
+        'ProjectionExpression': 'booking_id, connection_id, connection_type, type_key',
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            scanned += 1
+            if 'type_key' in item or 'connection_type' not in item:
+                continue
+            if dry_run:
+                updated += 1
+                continue
+            try:
+                table.update_item(
+                    Key={'booking_id': item['booking_id'], 'connection_id': item['connection_id']},
+                    UpdateExpression='SET type_key = :type_key',
+                    ConditionExpression='attribute_exists(connection_id)',
+                    ExpressionAttributeValues={
+                        ':type_key': f"{item['connection_type']}#{item['connection_id']}"
+                    }
+                )
+                updated += 1
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+                skipped += 1
+        if 'LastEvaluatedKey' not in response:
+            return scanned, updated, skipped
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=os.environ.get('CONNECTIONS_TABLE', 'websocket-connections'))
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION'))
+    parser.add_argument('--dry-run', action='store_true', help='count rows that need type_key without writing')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb', region_name=args.region).Table(args.table)
+    scanned, updated, skipped = backfill(table, dry_run=args.dry_run)
+    action = 'would update' if args.dry_run else 'updated'
+    print(f"scanned {scanned} rows, {action} {updated}, skipped {skipped} (deleted during backfill)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Measure per-invocation overhead of the API Gateway Management API client:
+building a new boto3 client on every event (old behaviour) versus the cached
+client from websocket_proxy.get_apigw_management_client().
+
+Each simulated invocation obtains a client and sends one post_to_connection to
+a local Management API stub (fake_apigw.py), so the numbers include client
+construction and TCP connection setup, but not TLS (the stub is plain HTTP -
+real endpoints add a TLS handshake per new connection on top).
+
+Usage:
+    python lambda/tools/bench_apigw_client.py --invocations 200
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_apigw import FakeManagementApi, use_dummy_credentials  # noqa: E402
+
+use_dummy_credentials()
+
+import boto3  # noqa: E402
+import websocket_proxy  # noqa: E402
+
+
+def run(label, get_client, stub, invocations):
+    stub.reset()
+    timings = []
+    for i in range(invocations):
+        started = time.perf_counter()
+        client = get_client()
+        client.post_to_connection(ConnectionId=f"conn-{i}", Data=b'{"type":"ack"}')
+        timings.append((time.perf_counter() - started) * 1000.0)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:<16} mean={statistics.mean(timings):7.2f}ms  p50={statistics.median(timings):7.2f}ms  "
+          f"p99={p99:7.2f}ms  tcp_connections={stub.tcp_connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invocations', type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    stub = FakeManagementApi().start()
+    endpoint = stub.endpoint_url
+    try:
+        run('per-event client', lambda: boto3.client('apigatewaymanagementapi', endpoint_url=endpoint,
+                                                      region_name=websocket_proxy.AWS_REGION),
+            stub, args.invocations)
+        run('cached client', lambda: websocket_proxy.get_apigw_management_client(endpoint), stub, args.invocations)
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat broadcast wall time against a local Management API stub.
+
+Compares the old fan-out (a new ThreadPoolExecutor per 25-connection chunk,
+each chunk awaited before the next) with websocket_proxy.fanout_engine
+(one long-lived executor, sends pipelined across all recipients). Both use the
+proxy's cached management client, so only the scheduling differs.
+
+Usage:
+    python lambda/tools/bench_broadcast.py
+    python lambda/tools/bench_broadcast.py --recipients 10 100 1000 --latency-ms 5 --slow-every 50
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_apigw import FakeManagementApi, use_dummy_credentials  # noqa: E402
+
+use_dummy_credentials()
+
+import websocket_proxy  # noqa: E402
+
+PAYLOAD = {'type': 'message', 'booking_id': '1', 'message': {'body': 'hello ' * 20}, 'broadcast': True}
+
+
+def chunked_broadcast(connection_ids, data, chunk_size=25, max_workers=10):
+    """The pre-existing fan-out: fresh executor per chunk, chunks run one after another."""
+    delivered = 0
+    for i in range(0, len(connection_ids), chunk_size):
+        chunk = connection_ids[i:i + chunk_size]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(websocket_proxy.send_to_client, conn_id, data) for conn_id in chunk]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+                delivered += 1
+    return delivered
+
+
+def time_broadcast(broadcast, connection_ids, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        broadcast(connection_ids, PAYLOAD)
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipients', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='stub service time per post_to_connection')
+    parser.add_argument('--slow-every', type=int, default=0,
+                        help='make every Nth recipient a straggler (adds --slow-ms to its send)')
+    parser.add_argument('--slow-ms', type=float, default=100.0)
+    parser.add_argument('--repeats', type=int, default=3, help='best-of-N wall time')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    stub = FakeManagementApi(latency_ms=args.latency_ms).start()
+    try:
+        websocket_proxy.apigw_management = websocket_proxy.get_apigw_management_client(stub.endpoint_url)
+        # Warm the client's connection pool and the shared executor
+        websocket_proxy.fanout_engine.broadcast([f"warm-{i}" for i in range(websocket_proxy.FANOUT_WORKERS)], PAYLOAD)
+
+        print(f"stub latency {args.latency_ms}ms, fan-out workers {websocket_proxy.FANOUT_WORKERS}"
+              + (f", every {args.slow_every}th send +{args.slow_ms}ms" if args.slow_every else ''))
+        print(f"{'recipients':>10}  {'chunked (old)':>14}  {'pipelined':>10}  {'speedup':>8}")
+        for count in args.recipients:
+            connection_ids = [f"conn-{i}" for i in range(count)]
+            stub.slow = {conn_id: args.slow_ms for conn_id in connection_ids[::args.slow_every]} if args.slow_every else {}
+            chunked_ms = time_broadcast(chunked_broadcast, connection_ids, args.repeats)
+            pipelined_ms = time_broadcast(websocket_proxy.fanout_engine.broadcast, connection_ids, args.repeats)
+            print(f"{count:>10}  {chunked_ms:>12.1f}ms  {pipelined_ms:>8.1f}ms  {chunked_ms / pipelined_ms:>7.2f}x")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark DynamoDB read units per $default message / $disconnect for the
+connection registry, comparing the legacy full-table scan with the
+connection_id GSI lookup.
+
+Runs the real get_connection_metadata() / remove_connection() from
+lambda/websocket_proxy.py against an in-process table stand-in that bills
+reads like DynamoDB (see fake_dynamodb.py). No AWS access needed; boto3 must
+be installed (pip install -r lambda/requirements.txt).
+
+Usage:
+    python lambda/tools/bench_connection_lookup.py
+    python lambda/tools/bench_connection_lookup.py --rows 100 10000 100000 --samples 50
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_dynamodb import FakeTable  # noqa: E402
+import websocket_proxy  # noqa: E402
+
+# Roughly the size of the JWTs the backend issues
+SAMPLE_TOKEN = 'eyJ' + 'x' * 240
+
+
+def build_table(rows, index_available):
+    table = FakeTable(
+        indexes={websocket_proxy.CONNECTION_ID_INDEX: ('connection_id', None)},
+        unavailable_indexes=() if index_available else (websocket_proxy.CONNECTION_ID_INDEX,),
+    )
+    connection_ids = []
+    for i in range(rows):
+        connection_id = f"conn{i:08d}="
+        connection_ids.append(connection_id)
+        table.put_item(Item={
+            'booking_id': str(i // 2) if i % 3 else f"user_{i}",
+            'connection_id': connection_id,
+            'connection_type': 'chat' if i % 3 else 'notification',
+            'created_at': 1700000000,
+            'ttl': 1700086400,
+            'token': SAMPLE_TOKEN,
+        })
+    return table, connection_ids
+
+
+def measure(rows, samples, index_available, seed):
+    table, connection_ids = build_table(rows, index_available)
+    websocket_proxy.connection_store = websocket_proxy.DynamoDBConnectionStore(table, table.client)
+    rng = random.Random(seed)
+    targets = [rng.choice(connection_ids) for _ in range(samples)]
+
+    table.reset_counters()
+    for connection_id in targets:
+        assert websocket_proxy.get_connection_metadata(connection_id) is not None
+    message_rcu = table.read_units / samples
+
+    table.reset_counters()
+    for connection_id in targets:
+        websocket_proxy.remove_connection(connection_id, booking_id=None)
+    disconnect_rcu = table.read_units / samples
+    return message_rcu, disconnect_rcu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--samples', type=int, default=20, help='random connections looked up per table size')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    # The scan fallback logs a warning per lookup; keep the report readable
+    logging.disable(logging.CRITICAL)
+    # Measure DynamoDB cost only - disable the warm-container metadata cache
+    websocket_proxy.metadata_cache = websocket_proxy.TTLCache(0, 0)
+
+    print(f"{'rows':>8}  {'path':<6}  {'RCU/message':>12}  {'RCU/disconnect':>15}")
+    for rows in args.rows:
+        for label, index_available in (('scan', False), ('index', True)):
+            message_rcu, disconnect_rcu = measure(rows, args.samples, index_available, args.seed)
+            print(f"{rows:>8}  {label:<6}  {message_rcu:>12.1f}  {disconnect_rcu:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
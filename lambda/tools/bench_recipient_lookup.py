@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compare chat-broadcast recipient lookup latency: the old sequential path (one
+Query per partition - booking, user_{owner_id}, user_{renter_id} - each awaited
+before the next) against websocket_proxy.get_connections_for_keys(), which
+queries all partitions concurrently and merges the results.
+
+Runs against fake_dynamodb.FakeTable with an artificial per-call round trip,
+so the numbers show request scheduling, not DynamoDB service time. Only whole
+partitions overlap - a large booking partition is still paged one Query after
+another - so the speedup shrinks towards 1x as the booking's audience grows.
+
+Usage:
+    python lambda/tools/bench_recipient_lookup.py
+    python lambda/tools/bench_recipient_lookup.py --booking-connections 2 500 5000 --latency-ms 8
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_apigw import use_dummy_credentials  # noqa: E402
+from fake_dynamodb import FakeTable  # noqa: E402
+
+use_dummy_credentials()
+
+import websocket_proxy  # noqa: E402
+
+BOOKING_ID = '42'
+OWNER_KEY = 'user_1'
+RENTER_KEY = 'user_2'
+
+
+def build_table(booking_connections, user_connections, latency_ms):
+    table = FakeTable(
+        indexes={
+            websocket_proxy.CONNECTION_ID_INDEX: ('connection_id', None),
+            websocket_proxy.TYPE_KEY_INDEX: ('booking_id', 'type_key'),
+        },
+        latency_ms=latency_ms,
+    )
+    websocket_proxy.connection_store = websocket_proxy.DynamoDBConnectionStore(table, table.client)
+    websocket_proxy.metadata_cache = websocket_proxy.TTLCache(0, 0)
+    for i in range(booking_connections):
+        websocket_proxy.store_connection(f"booking-{i}", BOOKING_ID, None, 'chat', 'token')
+    for key in (OWNER_KEY, RENTER_KEY):
+        for i in range(user_connections):
+            websocket_proxy.store_connection(f"{key}-chat-{i}", key, key[len('user_'):], 'chat', 'token')
+            websocket_proxy.store_connection(f"{key}-notification-{i}", key, key[len('user_'):], 'notification', 'token')
+    return table
+
+
+def sequential_lookup(keys, connection_type='chat'):
+    """The pre-existing path: one partition query after another, merged at the end."""
+    connection_ids = []
+    for key in keys:
+        connection_ids.extend(websocket_proxy.get_connection_ids_for_booking(key, connection_type=connection_type))
+    return list(set(connection_ids))
+
+
+def time_lookup(lookup, keys, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        count = len(lookup(keys))
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return min(timings), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--booking-connections', type=int, nargs='+', default=[2, 500, 5000])
+    parser.add_argument('--user-connections', type=int, default=3, help='chat (and notification) rows per participant')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='round trip added to every Query')
+    parser.add_argument('--mode', choices=['legacy', 'typed'], default='typed', help='RECIPIENT_KEY_MODE')
+    parser.add_argument('--repeats', type=int, default=5, help='best-of-N wall time')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    websocket_proxy.RECIPIENT_KEY_MODE = args.mode
+
+    keys = [BOOKING_ID, OWNER_KEY, RENTER_KEY]
+    print(f"query latency {args.latency_ms}ms, mode {args.mode}, page size {websocket_proxy.RECIPIENT_QUERY_PAGE_SIZE}, "
+          f"lookup workers {websocket_proxy.REGISTRY_LOOKUP_WORKERS}")
+    print(f"{'booking conns':>13}  {'recipients':>10}  {'sequential':>11}  {'concurrent':>11}  {'speedup':>8}")
+    for booking_connections in args.booking_connections:
+        build_table(booking_connections, args.user_connections, args.latency_ms)
+        sequential_ms, expected = time_lookup(sequential_lookup, keys, args.repeats)
+        concurrent_ms, count = time_lookup(websocket_proxy.get_connections_for_keys, keys, args.repeats)
+        assert count == expected, f"lookup mismatch: {count} != {expected}"
+        print(f"{booking_connections:>13}  {count:>10}  {sequential_ms:>9.1f}ms  {concurrent_ms:>9.1f}ms  "
+              f"{sequential_ms / concurrent_ms:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
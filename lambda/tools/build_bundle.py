@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Build a minimal deployment bundle for the WebSocket proxy Lambda.
+
+Starting from the handler file, computes its real import closure
+(modulefinder), copies only the modules of that closure that come from the
+package directory (third-party dependencies - stdlib and the boto3 stack are
+provided by the Lambda runtime), drops test directories, console scripts and
+stale bytecode, and precompiles everything to unchecked-hash .pyc files.
+/var/task is read-only, so without shipped bytecode every cold start compiles
+each imported module from source again.
+
+The output directory is what `lambda_source_dir` in modules/websocket_lambda
+zips (data.archive_file.lambda_zip); a deterministic zip of it is written
+next to it for size reporting and manual `aws lambda update-function-code`.
+
+For each variant (as packaged / import closure / closure + bytecode) prints
+the zip size, file count and the measured `python -X importtime` cost of
+importing the handler module, so the cold-start gain can be checked.
+Bytecode is only used by the interpreter version that wrote it: run this
+with the Lambda runtime's Python (python3.11).
+
+Usage:
+    python lambda/tools/build_bundle.py
+    python lambda/tools/build_bundle.py \\
+        --handler modules/websocket_lambda/.lambda_package/websocket_proxy.py \\
+        --packages modules/websocket_lambda/.lambda_package --out lambda/build/legacy
+"""
+import argparse
+import compileall
+import os
+import py_compile
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+from modulefinder import ModuleFinder
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+RUNTIME_PYTHON = (3, 11)
+# Provided by the Lambda Python runtime - never bundled, and not worth walking
+RUNTIME_PROVIDED = ['boto3', 'botocore', 's3transfer', 'jmespath', 'dateutil']
+SKIP_DIRS = {'__pycache__', 'tests', 'test', 'bin'}
+SKIP_SUFFIXES = ('.pyc', '.pyo')
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def skipped(relative_path):
+    parts = relative_path.split(os.sep)
+    return (any(part in SKIP_DIRS or part.endswith('.dist-info') for part in parts[:-1])
+            or relative_path.endswith(SKIP_SUFFIXES))
+
+
+def import_closure(handler, packages, extra_modules):
+    """Return the set of files under `packages` that importing `handler` can load."""
+    search_path = [os.path.dirname(handler)] + ([packages] if packages else []) + sys.path
+    finder = ModuleFinder(path=search_path, excludes=RUNTIME_PROVIDED)
+    finder.run_script(handler)
+    for module_name in extra_modules:
+        finder.import_hook(module_name)
+
+    files = set()
+    if not packages:
+        return files
+    root = os.path.abspath(packages)
+    for module in finder.modules.values():
+        path = module.__file__ and os.path.abspath(module.__file__)
+        if not path or not path.startswith(root + os.sep):
+            continue
+        relative = os.path.relpath(path, root)
+        if skipped(relative):
+            continue
+        files.add(relative)
+        if module.__path__:
+            # Package data (certifi's cacert.pem, py.typed, ...) sits next to __init__.py
+            package_dir = os.path.dirname(path)
+            for name in os.listdir(package_dir):
+                candidate = os.path.join(package_dir, name)
+                if os.path.isfile(candidate) and not name.endswith(('.py',) + SKIP_SUFFIXES):
+                    files.add(os.path.relpath(candidate, root))
+    return files
+
+
+def all_package_files(packages):
+    files = set()
+    if not packages:
+        return files
+    for dirpath, dirnames, filenames in os.walk(packages):
+        dirnames[:] = [d for d in dirnames if d != '__pycache__']
+        for name in filenames:
+            relative = os.path.relpath(os.path.join(dirpath, name), packages)
+            if not relative.endswith(SKIP_SUFFIXES):
+                files.add(relative)
+    return files
+
+
+def stage(out_dir, handler, packages, files, compile_bytecode):
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    shutil.copy2(handler, os.path.join(out_dir, os.path.basename(handler)))
+    for relative in sorted(files):
+        if relative == os.path.basename(handler):
+            continue
+        target = os.path.join(out_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(os.path.join(packages, relative), target)
+    if compile_bytecode:
+        # Unchecked-hash pycs are used as-is: no source stat or mtime comparison at import,
+        # and independent of the timestamps the zip/extraction leaves behind
+        compileall.compile_dir(out_dir, quiet=1, workers=0,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+
+def write_zip(source_dir, zip_path):
+    """Deterministic zip (sorted entries, fixed timestamps) of source_dir."""
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for dirpath, dirnames, filenames in os.walk(source_dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                info = zipfile.ZipInfo(os.path.relpath(path, source_dir), ZIP_DATE)
+                info.external_attr = 0o644 << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, 'rb') as handle:
+                    archive.writestr(info, handle.read())
+    return os.path.getsize(zip_path)
+
+
+def import_cost_ms(bundle_dir, module_name, runs):
+    """Median cumulative `python -X importtime` of module_name, imported from bundle_dir only."""
+    env = dict(os.environ, PYTHONPATH=bundle_dir, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module_name}"],
+            cwd=tempfile.gettempdir(), env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {module_name} from {bundle_dir} failed:\n{result.stderr[-2000:]}")
+        for line in result.stderr.splitlines():
+            match = _IMPORTTIME_LINE.match(line)
+            # Top-level entries are indented by exactly one space
+            if match and match.group(3) == ' ' and match.group(4) == module_name:
+                samples.append(int(match.group(2)) / 1000.0)
+    return statistics.median(samples)
+
+
+def count_files(directory):
+    return sum(len(filenames) for _, _, filenames in os.walk(directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handler', default=os.path.join(REPO_ROOT, 'lambda', 'websocket_proxy.py'))
+    parser.add_argument('--packages', help='directory holding third-party dependencies (e.g. the pip -t target)')
+    parser.add_argument('--include', action='append', default=[],
+                        help='extra module to bundle (for imports modulefinder cannot see); repeatable')
+    parser.add_argument('--out', default=os.path.join(REPO_ROOT, 'lambda', 'build', 'websocket_proxy'),
+                        help='output directory (the zip is written to <out>.zip)')
+    parser.add_argument('--runs', type=int, default=7, help='importtime samples per variant (median)')
+    args = parser.parse_args()
+
+    if sys.version_info[:2] != RUNTIME_PYTHON:
+        print(f"warning: building with Python {sys.version_info[0]}.{sys.version_info[1]}, Lambda runs "
+              f"{RUNTIME_PYTHON[0]}.{RUNTIME_PYTHON[1]} - shipped bytecode would be ignored", file=sys.stderr)
+
+    handler = os.path.abspath(args.handler)
+    args.out = os.path.abspath(args.out)
+    packages = os.path.abspath(args.packages) if args.packages else None
+    module_name = os.path.splitext(os.path.basename(handler))[0]
+    closure = import_closure(handler, packages, args.include)
+    everything = all_package_files(packages)
+
+    variants = []
+    with tempfile.TemporaryDirectory() as scratch:
+        if packages:
+            as_packaged = os.path.join(scratch, 'as-packaged')
+            stage(as_packaged, handler, packages, everything, compile_bytecode=False)
+            variants.append(('as packaged', as_packaged))
+        closure_only = os.path.join(scratch, 'closure')
+        stage(closure_only, handler, packages, closure, compile_bytecode=False)
+        variants.append(('import closure' if packages else 'handler only', closure_only))
+        stage(args.out, handler, packages, closure, compile_bytecode=True)
+        variants.append(('closure + bytecode' if packages else 'handler + bytecode', args.out))
+
+        print(f"handler {os.path.relpath(handler, REPO_ROOT)}: {len(closure)} of {len(everything)} package files "
+              f"in the import closure")
+        print(f"{'variant':<20}  {'files':>6}  {'zip size':>10}  {'import ' + module_name:>24}")
+        for label, directory in variants:
+            zip_path = (args.out + '.zip') if directory == args.out else os.path.join(scratch, f"{label}.zip")
+            size = write_zip(directory, zip_path)
+            cost = import_cost_ms(directory, module_name, args.runs)
+            print(f"{label:<20}  {count_files(directory):>6}  {size / 1024:>8.1f}KB  {cost:>22.1f}ms")
+
+    print(f"\nbundle: {os.path.relpath(args.out, REPO_ROOT)}/ (set lambda_source_dir to deploy it), "
+          f"zip: {os.path.relpath(args.out + '.zip', REPO_ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare two microbench.py result files and flag regressions.
+
+A benchmark regresses when its median per-call time grows by more than
+--threshold percent *and* by more than its own run-to-run spread (the larger
+stdev of the two runs), so noise on sub-microsecond differences isn't
+reported. A change in backend requests or Management API posts per call is
+always flagged - those are behaviour changes, not noise.
+
+Exits 1 if anything regressed (usable as a CI gate), 0 otherwise.
+
+Usage:
+    python lambda/tools/compare_bench.py baseline.json current.json
+    python lambda/tools/compare_bench.py baseline.json current.json --threshold 5
+"""
+import argparse
+import json
+import sys
+
+CALL_COUNTS = ('backend_requests_per_call', 'posts_per_call')
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(baseline, current, threshold):
+    """Returns a list of (name, baseline_us, current_us, change_pct, verdict) rows."""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        before, after = baseline.get(name), current.get(name)
+        if before is None or after is None:
+            rows.append((name, before and before['median_us'], after and after['median_us'], None,
+                         'new' if before is None else 'missing'))
+            continue
+        change = (after['median_us'] - before['median_us']) / before['median_us'] * 100.0
+        noise = max(before.get('stdev_us', 0.0), after.get('stdev_us', 0.0))
+        changed_calls = [key for key in CALL_COUNTS if before.get(key) != after.get(key)]
+        if changed_calls:
+            verdict = 'CALLS CHANGED: ' + ', '.join(
+                f"{key} {before.get(key)} -> {after.get(key)}" for key in changed_calls
+            )
+        elif change > threshold and after['median_us'] - before['median_us'] > noise:
+            verdict = 'REGRESSION'
+        elif change < -threshold and before['median_us'] - after['median_us'] > noise:
+            verdict = 'improved'
+        else:
+            verdict = 'ok'
+        rows.append((name, before['median_us'], after['median_us'], change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed median slowdown in percent')
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    for label, report in (('baseline', baseline), ('current', current)):
+        meta = report.get('meta', {})
+        print(f"{label:<9} revision {meta.get('revision')}  python {meta.get('python')}  {meta.get('created')}")
+    if baseline.get('meta', {}).get('python') != current.get('meta', {}).get('python'):
+        print("warning: different Python versions - timings are not comparable")
+
+    rows = compare(baseline['results'], current['results'], args.threshold)
+    print(f"\n{'benchmark':<28} {'baseline':>11} {'current':>11} {'change':>8}  verdict")
+    for name, before, after, change, verdict in rows:
+        before_text = f"{before:.1f}us" if before is not None else '-'
+        after_text = f"{after:.1f}us" if after is not None else '-'
+        change_text = f"{change:+.1f}%" if change is not None else '-'
+        print(f"{name:<28} {before_text:>11} {after_text:>11} {change_text:>8}  {verdict}")
+
+    regressions = [row for row in rows if row[4] == 'REGRESSION' or row[4].startswith('CALLS CHANGED')]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%")
+        return 1
+    print(f"\nno regressions beyond {args.threshold:g}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the API Gateway Management API (POST @connections/{id}).
+
+Runs a threaded HTTP/1.1 server with keep-alive so boto3's
+apigatewaymanagementapi client can be pointed at it via endpoint_url.
+Records every delivered frame; connection ids in `gone` answer 410
+GoneException, exactly like API Gateway does for closed sockets, and ids in
+`slow` ({connection_id: extra_ms}) simulate stragglers.
+
+Not shipped with the Lambda - used by the scripts in lambda/tools/.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+def use_dummy_credentials():
+    """boto3 signs every request; give it throwaway credentials for the local stub."""
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+class FakeManagementApi:
+    """
+    Args:
+        latency_ms: Artificial per-request service time
+        stage: Stage name used in the endpoint path
+    """
+
+    def __init__(self, latency_ms=0.0, stage='local'):
+        self.latency_ms = latency_ms
+        self.stage = stage
+        self.gone = set()
+        self.slow = {}
+        self.delivered = []
+        self.tcp_connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{self.stage}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.tcp_connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                connection_id = unquote(self.path.rsplit('/', 1)[-1])
+                delay_ms = stub.latency_ms + stub.slow.get(connection_id, 0.0)
+                if delay_ms:
+                    time.sleep(delay_ms / 1000.0)
+                if connection_id in stub.gone:
+                    payload = json.dumps({'message': 'Gone'}).encode('utf-8')
+                    self.send_response(410)
+                    self.send_header('x-amzn-ErrorType', 'GoneException')
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                with stub._lock:
+                    stub.delivered.append((connection_id, body))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.delivered.clear()
+            self.tcp_connections = 0
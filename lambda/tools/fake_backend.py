@@ -0,0 +1,108 @@
+"""
+Local stand-in for the FastAPI backend endpoints the WebSocket proxy calls.
+
+Serves the /connect, /message and /participants routes with HTTP/1.1
+keep-alive and a configurable service latency. Tokens of the form
+"user-<id>" authenticate as that user; anything else is user 1.
+
+Not shipped with the Lambda - used by the scripts in lambda/tools/.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BOOKING_ROUTE = re.compile(r'^/api/chat/ws/(?P<booking_id>[^/]+)/(?P<action>connect|message|participants)$')
+
+
+def user_id_from_token(token):
+    if token and token.startswith('user-'):
+        return token[len('user-'):]
+    return '1'
+
+
+class FakeBackend:
+    """
+    Args:
+        latency_ms: Artificial service time per request
+        participants: {booking_id: {'owner_id': ..., 'renter_id': ...}}; unknown bookings get owner 1 / renter 2
+        message_extra: Extra fields merged into every /message response (e.g. a recipients hint)
+    """
+
+    def __init__(self, latency_ms=0.0, participants=None, message_extra=None):
+        self.latency_ms = latency_ms
+        self.participants = dict(participants or {})
+        self.message_extra = dict(message_extra or {})
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path, payload):
+        """Build the JSON response for one request (override for custom behaviour)."""
+        user_id = user_id_from_token(payload.get('token'))
+        match = _BOOKING_ROUTE.match(path)
+        if match:
+            booking_id, action = match.group('booking_id'), match.group('action')
+            if action == 'participants':
+                return 200, self.participants.get(booking_id, {'owner_id': '1', 'renter_id': '2'})
+            if action == 'connect':
+                return 200, {'user_id': user_id, 'booking_id': booking_id, 'status': 'connected'}
+            response = {
+                'type': 'message',
+                'booking_id': booking_id,
+                'message': payload.get('message'),
+                'broadcast': True,
+            }
+            response.update(self.message_extra)
+            return 200, response
+        if path == '/api/chat/ws/connect':
+            return 200, {'user_id': user_id, 'status': 'connected'}
+        if path == '/api/notifications/ws/connect':
+            return 200, {'user_id': user_id, 'initial': {'type': 'notifications', 'items': []}}
+        if path in ('/api/notifications/ws/message', '/api/ws/items-feed/message'):
+            return 200, {'type': 'ack'}
+        if re.match(r'^/api/ws/bookings/[^/]+/connect$', path):
+            return 200, {'initial': {'type': 'status', 'status': 'confirmed'}}
+        return 404, {'detail': 'Not Found'}
+
+    def start(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes - without this, Nagle + delayed ACK add ~40ms
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with backend._lock:
+                    backend.requests[self.path] += 1
+                if backend.latency_ms:
+                    time.sleep(backend.latency_ms / 1000.0)
+                status, body = backend.respond(self.path, json.loads(raw) if raw else {})
+                encoded = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
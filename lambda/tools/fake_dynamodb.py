@@ -0,0 +1,307 @@
+"""
+In-process stand-in for the boto3 DynamoDB Table resource used by websocket_proxy.py.
+
+Only implements the calls and expression shapes the proxy actually uses
+(query/scan/get_item/put_item/delete_item/batch_writer with simple "attr = :v" and
+"begins_with(attr, :v)" clauses joined by AND), plus FakeTable.client - the low-level
+client's query, taking and returning typed {"S": ...} / {"N": ...} values. Read capacity is accounted the
+way DynamoDB bills it, so benchmarks can report read units per operation:
+
+- eventually consistent reads cost 0.5 RCU per 4 KB (rounded up per request)
+- Scan and Query are billed on the data *evaluated*, before FilterExpression
+- a single Scan/Query page stops at 1 MB of evaluated data
+
+Not shipped with the Lambda - used by the scripts in lambda/tools/.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+PAGE_LIMIT_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4 * 1024
+
+_CLAUSE_EQ = re.compile(r'^\s*([#\w]+)\s*=\s*(:\w+)\s*$')
+_CLAUSE_BEGINS = re.compile(r'^\s*begins_with\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)\s*$')
+
+
+def item_size(item):
+    """Approximate DynamoDB item size: attribute name bytes + value bytes."""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode('utf-8'))
+        if isinstance(value, (int, float)):
+            size += max(1, math.ceil(len(str(value)) / 2)) + 1
+        else:
+            size += len(str(value).encode('utf-8'))
+    return size
+
+
+def read_units(evaluated_bytes):
+    """Eventually consistent read cost for one request."""
+    return max(1, math.ceil(evaluated_bytes / READ_UNIT_BYTES)) * 0.5
+
+
+def _serialize(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {'S': str(value)}
+    return {'N': str(value)}
+
+
+def _deserialize(value):
+    if 'N' in value:
+        number = value['N']
+        return int(number) if number.lstrip('-').isdigit() else float(number)
+    return value['S']
+
+
+def _client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _parse_conditions(expression, values, names):
+    """Turn "a = :x AND begins_with(b, :y)" into a list of (attr, op, value)."""
+    if not expression:
+        return []
+    conditions = []
+    for clause in re.split(r'\s+AND\s+', expression, flags=re.IGNORECASE):
+        for pattern, op in ((_CLAUSE_EQ, 'eq'), (_CLAUSE_BEGINS, 'begins_with')):
+            match = pattern.match(clause)
+            if match:
+                attr = (names or {}).get(match.group(1), match.group(1))
+                conditions.append((attr, op, values[match.group(2)]))
+                break
+        else:
+            raise _client_error('ValidationException', f"Unsupported expression clause: {clause}", 'Query')
+    return conditions
+
+
+def _matches(item, conditions):
+    for attr, op, value in conditions:
+        current = item.get(attr)
+        if current is None:
+            return False
+        if op == 'eq' and current != value:
+            return False
+        if op == 'begins_with' and not str(current).startswith(value):
+            return False
+    return True
+
+
+def _project(item, projection, names):
+    if not projection:
+        return dict(item)
+    attrs = [(names or {}).get(a.strip(), a.strip()) for a in projection.split(',')]
+    return {a: item[a] for a in attrs if a in item}
+
+
+class FakeTable:
+    """
+    Dict-backed table with hash key booking_id and range key connection_id.
+
+    Args:
+        indexes: {index_name: (hash_attr, range_attr_or_None)} global secondary indexes
+        unavailable_indexes: index names that raise ValidationException, the way
+            DynamoDB rejects reads from a GSI that is still backfilling
+        latency_ms: Artificial round-trip time added to every read call
+    """
+
+    hash_key = 'booking_id'
+    range_key = 'connection_id'
+
+    def __init__(self, indexes=None, unavailable_indexes=(), latency_ms=0.0, name='websocket-connections'):
+        self.name = name
+        self.client = _FakeClient(self)
+        self.items = {}
+        # (IndexName, key condition, values) -> matching items in range key order, so following
+        # a paginated Query doesn't re-walk the whole table per page; cleared on every write
+        self._candidates = {}
+        self.indexes = dict(indexes or {})
+        self.unavailable_indexes = set(unavailable_indexes)
+        self.latency_ms = latency_ms
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.calls = Counter()
+
+    def reset_counters(self):
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.calls.clear()
+
+    def _key(self, item):
+        return (item[self.hash_key], item[self.range_key])
+
+    def _round_trip(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    # Writes -----------------------------------------------------------------
+
+    def put_item(self, Item, **kwargs):
+        self.calls['PutItem'] += 1
+        self.write_units += max(1, math.ceil(item_size(Item) / 1024))
+        self.items[self._key(Item)] = dict(Item)
+        self._candidates.clear()
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self.calls['DeleteItem'] += 1
+        self.write_units += 1
+        self.items.pop((Key[self.hash_key], Key[self.range_key]), None)
+        self._candidates.clear()
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ExpressionAttributeNames=None, **kwargs):
+        self.calls['UpdateItem'] += 1
+        self.write_units += 1
+        item = self.items.get((Key[self.hash_key], Key[self.range_key]))
+        if item is None:
+            return {}
+        self._candidates.clear()
+        assignments = UpdateExpression.strip()
+        if assignments.upper().startswith('SET '):
+            assignments = assignments[4:]
+        for assignment in assignments.split(','):
+            attr, placeholder = (part.strip() for part in assignment.split('='))
+            attr = (ExpressionAttributeNames or {}).get(attr, attr)
+            item[attr] = ExpressionAttributeValues[placeholder]
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _FakeBatchWriter(self)
+
+    # Reads ------------------------------------------------------------------
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.calls['GetItem'] += 1
+        self._round_trip()
+        item = self.items.get((Key[self.hash_key], Key[self.range_key]))
+        self.read_units += read_units(item_size(item) if item else 0)
+        if item is None:
+            return {}
+        return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def _page(self, candidates, conditions, start, limit, projection, names):
+        """Walk candidates from start, billing evaluated bytes, honouring Limit and 1 MB pages."""
+        evaluated_bytes = 0
+        evaluated = 0
+        results = []
+        position = start
+        while position < len(candidates):
+            item = candidates[position]
+            evaluated_bytes += item_size(item)
+            evaluated += 1
+            position += 1
+            if _matches(item, conditions):
+                results.append(_project(item, projection, names))
+            if (limit and evaluated >= limit) or evaluated_bytes >= PAGE_LIMIT_BYTES:
+                break
+        self.read_units += read_units(evaluated_bytes)
+        response = {'Items': results, 'Count': len(results), 'ScannedCount': evaluated}
+        if position < len(candidates):
+            response['LastEvaluatedKey'] = {'_position': position}
+        return response
+
+    def scan(self, FilterExpression=None, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+             ExclusiveStartKey=None, Limit=None, ProjectionExpression=None, **kwargs):
+        self.calls['Scan'] += 1
+        self._round_trip()
+        conditions = _parse_conditions(FilterExpression, ExpressionAttributeValues or {}, ExpressionAttributeNames)
+        start = (ExclusiveStartKey or {}).get('_position', 0)
+        return self._page(list(self.items.values()), conditions, start, Limit,
+                          ProjectionExpression, ExpressionAttributeNames)
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+              IndexName=None, FilterExpression=None, ExclusiveStartKey=None, Limit=None,
+              ProjectionExpression=None, **kwargs):
+        self.calls['Query'] += 1
+        self._round_trip()
+        values = ExpressionAttributeValues or {}
+        if IndexName:
+            if IndexName in self.unavailable_indexes:
+                raise _client_error('ValidationException',
+                                    f"Cannot read from backfilling global secondary index: {IndexName}", 'Query')
+            if IndexName not in self.indexes:
+                raise _client_error('ValidationException',
+                                    f"The table does not have the specified index: {IndexName}", 'Query')
+            hash_attr, range_attr = self.indexes[IndexName]
+        else:
+            hash_attr, range_attr = self.hash_key, self.range_key
+
+        key_conditions = _parse_conditions(KeyConditionExpression, values, ExpressionAttributeNames)
+        filter_conditions = _parse_conditions(FilterExpression, values, ExpressionAttributeNames)
+        cache_key = (IndexName, tuple(key_conditions))
+        candidates = self._candidates.get(cache_key)
+        if candidates is None:
+            # Sparse index semantics: only items carrying the index key attributes are in the index
+            candidates = [
+                item for item in self.items.values()
+                if hash_attr in item and (range_attr is None or range_attr in item) and _matches(item, key_conditions)
+            ]
+            if range_attr:
+                candidates.sort(key=lambda item: item[range_attr])
+            self._candidates[cache_key] = candidates
+        start = (ExclusiveStartKey or {}).get('_position', 0)
+        return self._page(candidates, filter_conditions, start, Limit,
+                          ProjectionExpression, ExpressionAttributeNames)
+
+
+class _FakeClient:
+    """Stand-in for boto3.client('dynamodb') on this one table (query only)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def query(self, TableName, ExpressionAttributeValues=None, ExclusiveStartKey=None, **kwargs):
+        if TableName != self.table.name:
+            raise _client_error('ResourceNotFoundException', f"Requested resource not found: {TableName}", 'Query')
+        values = {name: _deserialize(value) for name, value in (ExpressionAttributeValues or {}).items()}
+        start_key = {name: _deserialize(value) for name, value in ExclusiveStartKey.items()} if ExclusiveStartKey else None
+        response = self.table.query(ExpressionAttributeValues=values, ExclusiveStartKey=start_key, **kwargs)
+        response['Items'] = [{name: _serialize(value) for name, value in item.items()} for item in response['Items']]
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = {name: _serialize(value) for name, value in response['LastEvaluatedKey'].items()}
+        return response
+
+
+class _FakeBatchWriter:
+    """Buffers writes into BatchWriteItem calls of up to 25 requests, like boto3's batch_writer."""
+
+    BATCH_SIZE = 25
+
+    def __init__(self, table):
+        self.table = table
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def put_item(self, Item):
+        self.pending.append(('put', Item))
+        if len(self.pending) >= self.BATCH_SIZE:
+            self.flush()
+
+    def delete_item(self, Key):
+        self.pending.append(('delete', Key))
+        if len(self.pending) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        table = self.table
+        table.calls['BatchWriteItem'] += 1
+        for action, value in self.pending:
+            table.write_units += 1
+            key = (value[table.hash_key], value[table.range_key])
+            if action == 'put':
+                table.items[key] = dict(value)
+            else:
+                table.items.pop(key, None)
+        table._candidates.clear()
+        self.pending = []
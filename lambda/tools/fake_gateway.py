@@ -0,0 +1,368 @@
+"""
+Local stand-in for an API Gateway WebSocket API in front of the proxy Lambda.
+
+One asyncio loop (on a background thread) serves both sides of the gateway:
+
+- a WebSocket endpoint: the upgrade request becomes a $connect event (a non-2xx
+  response from the handler rejects the handshake), each text frame is routed
+  on its "action" field ($request.body.action) to a named route or $default,
+  and a close or dropped socket becomes $disconnect. Two-way routes (ping)
+  send the handler's response body back to the client, like a route response.
+- the Management API: POST/GET/DELETE @connections/{id} on a plain HTTP/1.1
+  keep-alive port, so the proxy's boto3 client can post frames to the sockets
+  (410 GoneException for unknown or still-connecting connections).
+
+Handler invocations run on a thread pool of `concurrency` workers. They share
+one process and its warm caches, so this measures the proxy, registry and
+fan-out path under load - not per-container cold starts.
+
+Not shipped with the Lambda - used by the scripts in lambda/tools/.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import secrets
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_OP_CONTINUATION, _OP_TEXT, _OP_BINARY, _OP_CLOSE, _OP_PING, _OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+_REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+            404: 'Not Found', 410: 'Gone', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+
+
+def encode_frame(opcode, payload):
+    """Server-to-client frame (never masked)."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader):
+    """Read one client frame. Returns (fin, opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+async def read_http_head(reader):
+    """Read a request line and headers. Returns (method, target, headers) or None at EOF."""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+def http_response(status, body=b'', headers=None):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}", f"Content-Length: {len(body)}"]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+class _Connection:
+
+    def __init__(self, connection_id, writer):
+        self.connection_id = connection_id
+        self.writer = writer
+        self.established = False
+        self.closed = False
+        self.connected_at = int(time.time() * 1000)
+        self.last_active_at = self.connected_at
+
+    def send(self, opcode, payload):
+        if not self.closed:
+            self.writer.write(encode_frame(opcode, payload))
+
+
+class _InvocationContext:
+    """The parts of the Lambda context object the proxy reads."""
+
+    def __init__(self, timeout_ms):
+        self.aws_request_id = secrets.token_hex(16)
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class FakeWebSocketGateway:
+    """
+    Args:
+        handler: Lambda handler, called as handler(event, context)
+        stage: Stage name (requestContext.stage and the Management API path prefix)
+        routes: Route keys selected by a frame's "action" field; anything else goes to $default
+        two_way_routes: Routes whose handler response body is sent back to the client
+        concurrency: Handler invocations running at once
+        timeout_ms: Lambda timeout reported through context.get_remaining_time_in_millis()
+    """
+
+    def __init__(self, handler, stage='local', routes=('ping',), two_way_routes=('ping',),
+                 concurrency=10, timeout_ms=29000):
+        self.handler = handler
+        self.stage = stage
+        self.routes = set(routes)
+        self.two_way_routes = set(two_way_routes)
+        self.timeout_ms = timeout_ms
+        self.connections = {}
+        self.invocations = Counter()
+        self.invocation_ms = defaultdict(list)
+        self.errors = Counter()
+        self.management_calls = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='lambda')
+        self._loop = None
+        self._thread = None
+        self._servers = []
+        self._pending = set()
+        self._management_writers = set()
+        self.ws_port = None
+        self.management_port = None
+
+    @property
+    def ws_url(self):
+        return f"ws://127.0.0.1:{self.ws_port}/{self.stage}"
+
+    @property
+    def management_endpoint_url(self):
+        return f"http://127.0.0.1:{self.management_port}/{self.stage}"
+
+    # Lifecycle --------------------------------------------------------------
+
+    def start(self):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def serve():
+            ws_server = await asyncio.start_server(self._serve_websocket, '127.0.0.1', 0, backlog=4096)
+            management_server = await asyncio.start_server(self._serve_management, '127.0.0.1', 0, backlog=1024)
+            self._servers = [ws_server, management_server]
+            self.ws_port = ws_server.sockets[0].getsockname()[1]
+            self.management_port = management_server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='gateway', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        async def shutdown():
+            for server in self._servers:
+                server.close()
+            # Closing the transports ends every connection task (EOF) - they then finish on their own
+            for connection in list(self.connections.values()):
+                connection.writer.close()
+            for writer in list(self._management_writers):
+                writer.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if tasks:
+                await asyncio.wait(tasks, timeout=5)
+
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def drain(self, timeout=30.0):
+        """Wait until no handler invocation is queued or running (e.g. trailing $disconnects)."""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def reset_stats(self):
+        self.invocations.clear()
+        self.invocation_ms.clear()
+        self.errors.clear()
+        self.management_calls.clear()
+
+    # Lambda invocations -----------------------------------------------------
+
+    def _event(self, route_key, connection_id, event_type, **extra):
+        event = {
+            'requestContext': {
+                'routeKey': route_key,
+                'eventType': event_type,
+                'connectionId': connection_id,
+                'domainName': '127.0.0.1',
+                'stage': self.stage,
+                'requestId': secrets.token_hex(8),
+                'requestTimeEpoch': int(time.time() * 1000),
+            },
+            'isBase64Encoded': False,
+        }
+        event.update(extra)
+        return event
+
+    def _invoke_sync(self, route_key, event):
+        started = time.perf_counter()
+        try:
+            return self.handler(event, _InvocationContext(self.timeout_ms))
+        except Exception:
+            self.errors[route_key] += 1
+            return {'statusCode': 502}
+        finally:
+            self.invocations[route_key] += 1
+            self.invocation_ms[route_key].append((time.perf_counter() - started) * 1000.0)
+
+    async def _invoke(self, route_key, event):
+        future = self._loop.run_in_executor(self._executor, self._invoke_sync, route_key, event)
+        self._pending.add(future)
+        try:
+            return await future
+        finally:
+            self._pending.discard(future)
+
+    # WebSocket side ---------------------------------------------------------
+
+    async def _serve_websocket(self, reader, writer):
+        head = await read_http_head(reader)
+        if head is None:
+            writer.close()
+            return
+        _, target, headers = head
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            writer.write(http_response(400))
+            writer.close()
+            return
+
+        connection_id = base64.b64encode(secrets.token_bytes(9)).decode('ascii').replace('/', '_').replace('+', '-')
+        connection = _Connection(connection_id, writer)
+        # Registered before $connect runs, but posts are refused until the handshake completes
+        self.connections[connection_id] = connection
+        query = dict(parse_qsl(urlsplit(target).query, keep_blank_values=True))
+        result = await self._invoke('$connect', self._event(
+            '$connect', connection_id, 'CONNECT',
+            queryStringParameters=query or None,
+            headers={name.title(): value for name, value in headers.items()},
+        ))
+        status = result.get('statusCode', 200) if isinstance(result, dict) else 200
+        if status >= 300:
+            del self.connections[connection_id]
+            writer.write(http_response(status, (result.get('body') or '').encode('utf-8')))
+            writer.close()
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode('ascii')).digest()).decode('ascii')
+        writer.write((
+            'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode('ascii'))
+        connection.established = True
+
+        fragments = []
+        try:
+            while True:
+                fin, opcode, payload = await read_frame(reader)
+                connection.last_active_at = int(time.time() * 1000)
+                if opcode == _OP_CLOSE:
+                    connection.send(_OP_CLOSE, payload[:2])
+                    break
+                if opcode == _OP_PING:
+                    connection.send(_OP_PONG, payload)
+                    continue
+                if opcode == _OP_PONG:
+                    continue
+                fragments.append(payload)
+                if not fin:
+                    continue
+                message = b''.join(fragments)
+                fragments = []
+                asyncio.ensure_future(self._route_message(connection, message))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            connection.closed = True
+            self.connections.pop(connection_id, None)
+            writer.close()
+            await self._invoke('$disconnect', self._event('$disconnect', connection_id, 'DISCONNECT'))
+
+    async def _route_message(self, connection, message):
+        body = message.decode('utf-8', errors='replace')
+        route_key = '$default'
+        try:
+            action = json.loads(body).get('action')
+            if action in self.routes:
+                route_key = action
+        except (ValueError, AttributeError):
+            pass
+        result = await self._invoke(route_key, self._event(route_key, connection.connection_id, 'MESSAGE', body=body))
+        if route_key in self.two_way_routes and isinstance(result, dict) and result.get('body'):
+            connection.send(_OP_TEXT, result['body'].encode('utf-8'))
+
+    # Management API side ----------------------------------------------------
+
+    async def _serve_management(self, reader, writer):
+        self._management_writers.add(writer)
+        try:
+            while True:
+                head = await read_http_head(reader)
+                if head is None:
+                    break
+                method, target, headers = head
+                length = int(headers.get('content-length') or 0)
+                body = await reader.readexactly(length) if length else b''
+                writer.write(self._management_response(method, unquote(urlsplit(target).path), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._management_writers.discard(writer)
+            writer.close()
+
+    def _management_response(self, method, path, body):
+        self.management_calls[method] += 1
+        prefix = f"/{self.stage}/@connections/"
+        if not path.startswith(prefix):
+            return http_response(404, b'{"message":"Not Found"}', {'x-amzn-ErrorType': 'NotFoundException'})
+        connection = self.connections.get(path[len(prefix):])
+        # API Gateway refuses posts until $connect has completed
+        if connection is None or connection.closed or not connection.established:
+            return http_response(410, b'{"message":"Gone"}',
+                                 {'x-amzn-ErrorType': 'GoneException', 'Content-Type': 'application/json'})
+        if method == 'POST':
+            connection.send(_OP_TEXT, body)
+            return http_response(200)
+        if method == 'DELETE':
+            connection.send(_OP_CLOSE, struct.pack('!H', 1000))
+            connection.closed = True
+            connection.writer.close()
+            return http_response(204)
+        info = json.dumps({
+            'connectedAt': connection.connected_at,
+            'lastActiveAt': connection.last_active_at,
+            'identity': {'sourceIp': '127.0.0.1'}
+        }).encode('utf-8')
+        return http_response(200, info, {'Content-Type': 'application/json'})
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Local end-to-end load test of the WebSocket proxy: real sockets, no AWS.
+
+Starts fake_backend.FakeBackend and fake_gateway.FakeWebSocketGateway in front of
+websocket_proxy.lambda_handler (in-memory or SQLite connection registry), then
+drives it with clients built on the websocket-client package vendored in
+modules/websocket_lambda/.lambda_package:
+
+1. connect  - opens --clients chat connections spread over --bookings bookings
+              and reports handshake latency ($connect runs inside the handshake)
+2. messages - --senders clients in closed loop send --messages chat messages; the
+              round trip ends when the sender receives its own broadcast
+3. broadcast - for each --broadcast-sizes N, N clients join one booking and a
+              single message is sent; completion is the last recipient's arrival
+
+Usage:
+    python lambda/tools/loadtest.py
+    python lambda/tools/loadtest.py --clients 2000 --bookings 200 --messages 1000 \\
+        --broadcast-sizes 10 100 1000 --backend-latency-ms 20 --concurrency 20
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import resource
+import selectors
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, '..'))
+VENDORED_PACKAGES = os.path.join(TOOLS_DIR, '..', '..', 'modules', 'websocket_lambda', '.lambda_package')
+
+from fake_apigw import use_dummy_credentials  # noqa: E402
+from fake_backend import FakeBackend  # noqa: E402
+from fake_gateway import FakeWebSocketGateway  # noqa: E402
+
+
+def import_vendored_websocket():
+    """Import websocket-client from the Lambda package without letting its other vendored
+    packages (urllib3, requests, ...) shadow the ones botocore uses."""
+    sys.path.insert(0, VENDORED_PACKAGES)
+    try:
+        import websocket
+    finally:
+        sys.path.remove(VENDORED_PACKAGES)
+    return websocket
+
+
+def percentiles(samples):
+    if not samples:
+        return 'n/a'
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return f"p50 {at(0.50):7.1f}ms  p95 {at(0.95):7.1f}ms  p99 {at(0.99):7.1f}ms  max {ordered[-1]:7.1f}ms"
+
+
+class Receiver:
+    """
+    Reads every client socket on one thread (selectors) and tracks broadcast arrivals.
+
+    Messages are chat payloads whose "message" carries the sender's client_msg_id.
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._changes = queue.Queue()
+        self._lock = threading.Lock()
+        self._tracked = {}
+        self._stopped = threading.Event()
+        self.received = 0
+        self._thread = threading.Thread(target=self._run, name='receiver', daemon=True)
+        self._thread.start()
+
+    def add(self, ws):
+        self._changes.put(('add', ws))
+
+    def forget(self, sockets):
+        """Stop watching sockets; returns once done (before they are closed - their fds get reused)."""
+        for ws in sockets:
+            self._changes.put(('remove', ws))
+        processed = threading.Event()
+        self._changes.put(('sync', processed))
+        processed.wait(5)
+
+    def track(self, msg_id, sender, expected):
+        """Start waiting for msg_id; returns an Event set once `expected` clients received it."""
+        entry = {'sent': time.perf_counter(), 'sender': sender, 'expected': expected, 'count': 0,
+                 'sender_at': None, 'last_at': None, 'done': threading.Event()}
+        with self._lock:
+            self._tracked[msg_id] = entry
+        return entry
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            while not self._changes.empty():
+                change, ws = self._changes.get()
+                try:
+                    if change == 'add':
+                        self._selector.register(ws.sock, selectors.EVENT_READ, ws)
+                    elif change == 'remove':
+                        self._selector.unregister(ws.sock)
+                    else:
+                        ws.set()
+                except (KeyError, ValueError):
+                    pass
+            for key, _ in self._selector.select(timeout=0.02):
+                ws = key.data
+                try:
+                    data = ws.recv()
+                except Exception:
+                    data = None
+                if not data:
+                    self._selector.unregister(key.fileobj)
+                    continue
+                self._on_message(ws, data)
+
+    def _on_message(self, ws, data):
+        now = time.perf_counter()
+        self.received += 1
+        try:
+            message = json.loads(data).get('message') or {}
+            msg_id = message.get('client_msg_id') if isinstance(message, dict) else None
+        except (ValueError, AttributeError):
+            return
+        with self._lock:
+            entry = self._tracked.get(msg_id)
+            if entry is None:
+                return
+            entry['count'] += 1
+            entry['last_at'] = now
+            if ws is entry['sender']:
+                entry['sender_at'] = now
+            if entry['count'] >= entry['expected']:
+                entry['done'].set()
+
+
+def connect_clients(websocket, url, count, booking_for, workers, receiver):
+    """Open `count` clients; returns (clients by booking, handshake latencies ms, failures)."""
+    def connect(index):
+        booking_id = booking_for(index)
+        started = time.perf_counter()
+        ws = websocket.create_connection(
+            f"{url}?type=chat&booking_id={booking_id}&token=user-{index + 10}", timeout=30, enable_multithread=True
+        )
+        return booking_id, ws, (time.perf_counter() - started) * 1000.0
+
+    clients, latencies, failures = {}, [], 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(connect, index) for index in range(count)]:
+            try:
+                booking_id, ws, elapsed_ms = future.result()
+            except Exception:
+                failures += 1
+                continue
+            clients.setdefault(booking_id, []).append(ws)
+            latencies.append(elapsed_ms)
+            receiver.add(ws)
+    return clients, latencies, failures
+
+
+def close_clients(clients, receiver):
+    sockets = list(itertools.chain.from_iterable(clients.values()))
+    receiver.forget(sockets)
+    for ws in sockets:
+        try:
+            ws.close(timeout=1)
+        except Exception:
+            pass
+
+
+def send_tracked(receiver, sender, expected, msg_id, timeout):
+    entry = receiver.track(msg_id, sender, expected)
+    sender.send(json.dumps({'text': 'load test', 'client_msg_id': msg_id}))
+    entry['done'].wait(timeout)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=500, help='connections for the connect and message phases')
+    parser.add_argument('--bookings', type=int, default=50, help='bookings the clients are spread over')
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--senders', type=int, default=10, help='clients sending concurrently (closed loop)')
+    parser.add_argument('--broadcast-sizes', type=int, nargs='*', default=[10, 100, 1000])
+    parser.add_argument('--broadcast-repeats', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=10, help='handler invocations running at once')
+    parser.add_argument('--connect-workers', type=int, default=50)
+    parser.add_argument('--backend-latency-ms', type=float, default=5.0)
+    parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory', help='CONNECTION_STORE')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds to wait for one message to arrive')
+    args = parser.parse_args()
+
+    # Two sockets (client + gateway side) per connection
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    websocket = import_vendored_websocket()
+    backend = FakeBackend(latency_ms=args.backend_latency_ms).start()
+    use_dummy_credentials()
+    os.environ.update({
+        'BACKEND_URL': backend.url,
+        'CONNECTION_STORE': args.store,
+        'METRICS_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_SAMPLE_RATE': '0',
+    })
+    import websocket_proxy
+    logging.disable(logging.WARNING)
+
+    gateway = FakeWebSocketGateway(websocket_proxy.lambda_handler, concurrency=args.concurrency).start()
+    os.environ['API_GATEWAY_ENDPOINT'] = gateway.management_endpoint_url
+    receiver = Receiver()
+    print(f"store {args.store}, handler concurrency {args.concurrency}, backend latency {args.backend_latency_ms}ms, "
+          f"websocket-client {websocket.__version__}")
+
+    # Cold start: the first $connect imports boto3 and creates the clients - keep it out of the percentiles
+    started = time.perf_counter()
+    warmup, _, _ = connect_clients(websocket, gateway.ws_url, 1, lambda index: 'warmup', 1, receiver)
+    print(f"cold start first $connect {(time.perf_counter() - started) * 1000.0:.0f}ms")
+    close_clients(warmup, receiver)
+    gateway.drain()
+    gateway.reset_stats()
+    backend.requests.clear()
+
+    # 1. connect
+    started = time.perf_counter()
+    clients, latencies, failures = connect_clients(
+        websocket, gateway.ws_url, args.clients, lambda index: f"load-{index % args.bookings}",
+        args.connect_workers, receiver
+    )
+    elapsed = time.perf_counter() - started
+    print(f"\nconnect    {len(latencies)} clients in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s), "
+          f"{failures} failed")
+    print(f"           {percentiles(latencies)}")
+
+    # 2. messages
+    if args.messages and clients:
+        senders = [bucket[0] for bucket in clients.values()][:args.senders]
+        bucket_size = {id(bucket[0]): len(bucket) for bucket in clients.values()}
+        msg_ids = itertools.count()
+        round_trips, lost = [], 0
+        lock = threading.Lock()
+
+        def sender_loop(sender, count):
+            nonlocal lost
+            for _ in range(count):
+                entry = send_tracked(receiver, sender, bucket_size[id(sender)], f"rt-{next(msg_ids)}", args.timeout)
+                with lock:
+                    if entry['sender_at'] is None:
+                        lost += 1
+                    else:
+                        round_trips.append((entry['sender_at'] - entry['sent']) * 1000.0)
+
+        started = time.perf_counter()
+        per_sender = max(1, args.messages // len(senders))
+        with ThreadPoolExecutor(max_workers=len(senders)) as pool:
+            list(pool.map(sender_loop, senders, [per_sender] * len(senders)))
+        elapsed = time.perf_counter() - started
+        sent = per_sender * len(senders)
+        print(f"\nmessages   {sent} from {len(senders)} senders in {elapsed:.1f}s ({sent / elapsed:.0f} msg/s), "
+              f"~{args.clients // args.bookings} recipients each, {lost} lost")
+        print(f"round trip {percentiles(round_trips)}")
+
+    close_clients(clients, receiver)
+    gateway.drain()
+
+    # 3. broadcast
+    if args.broadcast_sizes:
+        print(f"\n{'broadcast':>10}  {'connect':>9}  {'completion (median)':>20}  {'delivered':>10}")
+    for size in args.broadcast_sizes:
+        booking_id = f"broadcast-{size}"
+        started = time.perf_counter()
+        group, _, failures = connect_clients(
+            websocket, gateway.ws_url, size, lambda index: booking_id, args.connect_workers, receiver
+        )
+        connect_s = time.perf_counter() - started
+        members = group.get(booking_id, [])
+        completions, delivered = [], 0
+        for repeat in range(args.broadcast_repeats):
+            entry = send_tracked(receiver, members[0], len(members), f"bc-{size}-{repeat}", args.timeout)
+            delivered = entry['count']
+            if entry['last_at'] is not None:
+                completions.append((entry['last_at'] - entry['sent']) * 1000.0)
+        completion = f"{statistics.median(completions):.1f}ms" if completions else 'n/a'
+        print(f"{len(members):>10}  {connect_s:>8.1f}s  {completion:>20}  {delivered:>5}/{len(members):<4}")
+        close_clients(group, receiver)
+        gateway.drain()
+
+    print("\nhandler invocations")
+    for route, timings in sorted(gateway.invocation_ms.items()):
+        print(f"  {route:<12} {len(timings):>7}  {percentiles(timings)}"
+              + (f"  errors {gateway.errors[route]}" if gateway.errors[route] else ''))
+    print(f"backend requests {sum(backend.requests.values())}, "
+          f"management API calls {dict(gateway.management_calls)}")
+
+    receiver.stop()
+    gateway.stop()
+    backend.stop()
+
+
+if __name__ == '__main__':
+    main()
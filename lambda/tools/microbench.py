@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Deterministic microbenchmarks of the proxy's hot paths, called directly (no sockets).
+
+- registry: MemoryConnectionStore
+- Management API: RecordingManagementClient (records post_to_connection calls in memory)
+- backend: StubBackendPool, answering from fake_backend.FakeBackend.respond() in
+  process, with an optional fixed service time (default 0 - pure proxy cost)
+- logging: production shape (INFO, JSON formatter) into os.devnull
+
+Each benchmark reports the median and minimum per-call time over --repeat rounds
+(timeit, GC off) plus backend requests and Management API posts per call, and
+the whole run is written as JSON for compare_bench.py.
+
+Usage:
+    python lambda/tools/microbench.py --output lambda/build/bench-before.json
+    ... change websocket_proxy.py ...
+    python lambda/tools/microbench.py --output lambda/build/bench-after.json
+    python lambda/tools/compare_bench.py lambda/build/bench-before.json lambda/build/bench-after.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_apigw import use_dummy_credentials  # noqa: E402
+from fake_backend import FakeBackend  # noqa: E402
+
+use_dummy_credentials()
+os.environ.setdefault('CONNECTION_STORE', 'memory')
+os.environ.setdefault('METRICS_ENABLED', 'false')
+os.environ.setdefault('LOG_SAMPLE_RATE', '0')
+
+import websocket_proxy  # noqa: E402
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+
+class _GoneException(Exception):
+    pass
+
+
+class RecordingManagementClient:
+    """apigatewaymanagementapi client stand-in: posts are counted, nothing is sent."""
+
+    class exceptions:
+        GoneException = _GoneException
+
+    def __init__(self):
+        self.posts = 0
+        self.bytes = 0
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.posts += 1
+        self.bytes += len(Data)
+        return {}
+
+
+class StubBackendPool:
+    """BackendConnectionPool stand-in answering from FakeBackend.respond() without a socket."""
+
+    def __init__(self, latency_ms=0.0):
+        self.backend = FakeBackend(latency_ms=latency_ms)
+        self.latency_ms = latency_ms
+        self.requests = 0
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        self.requests += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        status, payload = self.backend.respond(urlsplit(url).path, json.loads(body) if body else {})
+        return status, json.dumps(payload).encode('utf-8')
+
+    def stats(self):
+        return {'requests': self.requests}
+
+
+class Bench:
+
+    def __init__(self, backend_latency_ms):
+        self.client = RecordingManagementClient()
+        self.pool = StubBackendPool(backend_latency_ms)
+        self.ids = itertools.count()
+        websocket_proxy.connection_store = websocket_proxy.MemoryConnectionStore()
+        websocket_proxy.backend_pool = self.pool
+        websocket_proxy.apigw_clients['local'] = self.client
+        self.activate()
+
+    def activate(self):
+        """Point the module's per-invocation globals at the recording client (lambda_handler resets them)."""
+        websocket_proxy.apigw_endpoint_url = 'local'
+        websocket_proxy.apigw_management = self.client
+
+    def populate_booking(self, booking_id, recipients):
+        for i in range(recipients):
+            websocket_proxy.store_connection(f"{booking_id}-{i}", booking_id, None, 'chat', 'user-10')
+        return f"{booking_id}-0"
+
+    # Benchmarks -------------------------------------------------------------
+
+    def handle_connect(self):
+        event = {'queryStringParameters': {'type': 'chat', 'booking_id': 'connect-bench', 'token': 'user-10'}}
+
+        def run():
+            websocket_proxy.handle_connect(event, f"connect-{next(self.ids)}")
+        return run
+
+    def handle_message_chat(self, recipients):
+        booking_id = f"chat-{recipients}"
+        sender = self.populate_booking(booking_id, recipients)
+        event = {'body': json.dumps({'text': 'benchmark message', 'client_msg_id': 'm'})}
+
+        def run():
+            websocket_proxy.handle_message(event, sender)
+        return run
+
+    def handle_message_keepalive(self):
+        websocket_proxy.store_connection('keepalive-0', 'keepalive', None, 'booking', 'user-10')
+        event = {'body': json.dumps({'type': 'keepalive'})}
+
+        def run():
+            websocket_proxy.handle_message(event, 'keepalive-0')
+        return run
+
+    def lambda_handler_ping(self):
+        event = {'requestContext': {'routeKey': websocket_proxy.PING_ROUTE_KEY, 'connectionId': 'ping-0',
+                                    'domainName': 'local', 'stage': 'local'},
+                 'body': json.dumps({'action': websocket_proxy.PING_ROUTE_KEY})}
+
+        def run():
+            websocket_proxy.lambda_handler(event, None)
+        return run
+
+    def broadcast(self, recipients):
+        connection_ids = [f"broadcast-{i}" for i in range(recipients)]
+        payload = {'type': 'message', 'booking_id': 'broadcast', 'message': {'id': 1, 'text': 'x' * 200}}
+
+        def run():
+            websocket_proxy.fanout_engine.broadcast(connection_ids, payload)
+        return run
+
+
+def measure(bench, name, run, number, repeat, warmup):
+    for _ in range(warmup):
+        run()
+        bench.activate()
+    requests_before, posts_before = bench.pool.requests, bench.client.posts
+    timer = timeit.Timer(lambda: (run(), bench.activate()))
+    rounds = [elapsed / number * 1e6 for elapsed in timer.repeat(repeat=repeat, number=number)]
+    calls = number * repeat
+    return {
+        'median_us': round(statistics.median(rounds), 2),
+        'min_us': round(min(rounds), 2),
+        'stdev_us': round(statistics.stdev(rounds), 2) if len(rounds) > 1 else 0.0,
+        'number': number,
+        'repeat': repeat,
+        'backend_requests_per_call': round((bench.pool.requests - requests_before) / calls, 3),
+        'posts_per_call': round((bench.client.posts - posts_before) / calls, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'lambda', 'build', 'microbench.json'))
+    parser.add_argument('--repeat', type=int, default=7, help='timing rounds per benchmark (median reported)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the per-round call counts')
+    parser.add_argument('--backend-latency-ms', type=float, default=0.0)
+    parser.add_argument('--recipients', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--broadcast-sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--only', nargs='*', help='run only benchmarks whose name starts with one of these')
+    args = parser.parse_args()
+
+    # Production log shape: INFO records, JSON formatted, written (to /dev/null)
+    log_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    log_handler.setFormatter(websocket_proxy.JsonLogFormatter())
+    logging.getLogger().addHandler(log_handler)
+
+    bench = Bench(args.backend_latency_ms)
+    # (name, factory, calls per round) - heavier benchmarks run fewer calls per round
+    plan = [
+        ('lambda_handler_ping', bench.lambda_handler_ping, 2000),
+        ('handle_message_keepalive', bench.handle_message_keepalive, 1000),
+        ('handle_connect', bench.handle_connect, 500),
+    ]
+    plan += [(f"handle_message_chat_{n}", lambda n=n: bench.handle_message_chat(n), max(5, 500 // n))
+             for n in args.recipients]
+    plan += [(f"broadcast_{n}", lambda n=n: bench.broadcast(n), max(3, 2000 // n)) for n in args.broadcast_sizes]
+
+    results = {}
+    print(f"{'benchmark':<28} {'median':>11} {'min':>11} {'backend/call':>13} {'posts/call':>11}")
+    for name, factory, number in plan:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        number = max(1, int(number * args.scale))
+        result = measure(bench, name, factory(), number, args.repeat, warmup=max(1, number // 10))
+        results[name] = result
+        print(f"{name:<28} {result['median_us']:>9.1f}us {result['min_us']:>9.1f}us "
+              f"{result['backend_requests_per_call']:>13} {result['posts_per_call']:>11}")
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'backend_latency_ms': args.backend_latency_ms,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\nwritten to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Replay a trace of API Gateway WebSocket events against lambda_handler, no AWS.
+
+The trace is JSONL, one sanitized event per line:
+
+    {"time_ms": 1720000000123, "route_key": "$connect", "connection_id": "c1",
+     "connection_type": "chat", "booking_id": "b1", "user_id": "17"}
+    {"time_ms": 1720000004211, "route_key": "$default", "connection_id": "c1", "body_size": 180}
+    {"time_ms": 1720000030000, "route_key": "ping", "connection_id": "c1"}
+    {"time_ms": 1720000090000, "route_key": "$disconnect", "connection_id": "c1"}
+
+time_ms is API Gateway's requestTimeEpoch. Message bodies are not captured: a
+$default event becomes a chat message padded to body_size bytes, or a keepalive
+when "message_type": "keepalive" (a literal "body" is used as-is if present).
+Connections whose first event isn't $connect are connected before the replay
+starts, so traces cut mid-session still route.
+
+Events run one at a time, like a single Lambda execution environment, against:
+
+- registry: DynamoDBConnectionStore on fake_dynamodb.FakeTable (calls and R/WCU counted)
+- Management API: microbench.RecordingManagementClient
+- backend: microbench.StubBackendPool (fake_backend responses, --backend-latency-ms)
+
+--speed paces the events: 1 keeps the original gaps (TTL caches expire as in
+production), 3 compresses them three-fold (a 3x busier day), 0 runs flat out.
+Peak concurrency is then simulated from the (scaled) arrival times and the
+measured durations.
+
+Usage:
+    python lambda/tools/replay.py --generate lambda/build/trace.jsonl --connections 500
+    python lambda/tools/replay.py lambda/build/trace.jsonl --speed 0
+    python lambda/tools/replay.py trace.jsonl --speed 3 --backend-latency-ms 20 --dynamodb-latency-ms 4
+"""
+import argparse
+import bisect
+import heapq
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('API_GATEWAY_ENDPOINT', 'replay')
+os.environ.setdefault('METRICS_ENABLED', 'false')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from fake_dynamodb import FakeTable  # noqa: E402
+from microbench import RecordingManagementClient, StubBackendPool, websocket_proxy  # noqa: E402
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+# Lambda allocates CPU in proportion to memory: one full vCPU at 1769 MB
+FULL_VCPU_MEMORY_MB = 1769
+MEMORY_SIZES_MB = (128, 256, 512, 1024, 1769)
+
+
+class ReplayContext:
+    """Minimal Lambda context: request id and the remaining-time clock."""
+
+    def __init__(self, request_id, timeout_ms):
+        self.aws_request_id = request_id
+        self._deadline = time.monotonic() + timeout_ms / 1000.0
+
+    def get_remaining_time_in_millis(self):
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def load_trace(path):
+    with open(path) as handle:
+        records = [json.loads(line) for line in handle if line.strip()]
+    records.sort(key=lambda record: record['time_ms'])
+    return records
+
+
+def build_event(record, connections, sequence):
+    """Turn one trace record into the event API Gateway would deliver."""
+    route_key = record['route_key']
+    connection_id = record['connection_id']
+    event = {
+        'requestContext': {
+            'routeKey': route_key,
+            'connectionId': connection_id,
+            'requestTimeEpoch': record['time_ms'],
+        },
+    }
+    if route_key == '$connect':
+        params = {'type': record.get('connection_type', 'chat'), 'token': f"user-{record.get('user_id', '1')}"}
+        if record.get('booking_id'):
+            params['booking_id'] = record['booking_id']
+        event['queryStringParameters'] = params
+        connections[connection_id] = record
+    elif route_key != '$disconnect':
+        if 'body' in record:
+            body = record['body']
+        elif route_key == websocket_proxy.PING_ROUTE_KEY:
+            body = json.dumps({'action': websocket_proxy.PING_ROUTE_KEY})
+        elif record.get('message_type') == 'keepalive':
+            body = json.dumps({'type': 'keepalive'})
+        else:
+            message = {'text': '', 'client_msg_id': f"replay-{sequence}"}
+            booking_id = connections.get(connection_id, {}).get('booking_id')
+            if booking_id:
+                message['booking_id'] = booking_id
+            padding = record.get('body_size', 0) - len(json.dumps(message))
+            message['text'] = 'x' * max(1, padding)
+            body = json.dumps(message)
+        event['body'] = body
+    return event
+
+
+class Replayer:
+
+    def __init__(self, backend_latency_ms, dynamodb_latency_ms, timeout_ms):
+        self.table = FakeTable(
+            indexes={
+                websocket_proxy.CONNECTION_ID_INDEX: ('connection_id', None),
+                websocket_proxy.TYPE_KEY_INDEX: ('booking_id', 'type_key'),
+            },
+            latency_ms=dynamodb_latency_ms,
+        )
+        self.client = RecordingManagementClient()
+        self.pool = StubBackendPool(backend_latency_ms)
+        self.timeout_ms = timeout_ms
+        websocket_proxy.connection_store = websocket_proxy.DynamoDBConnectionStore(self.table, self.table.client)
+        websocket_proxy.backend_pool = self.pool
+        websocket_proxy.apigw_clients[os.environ['API_GATEWAY_ENDPOINT']] = self.client
+
+    def invoke(self, event, request_id):
+        """Run one event; returns (wall ms, CPU ms, {call: count}, status code)."""
+        dynamodb_before = Counter(self.table.calls)
+        units_before = (self.table.read_units, self.table.write_units)
+        requests_before, posts_before = self.pool.requests, self.client.posts
+        context = ReplayContext(request_id, self.timeout_ms)
+        cpu_started, started = time.process_time(), time.perf_counter()
+        response = websocket_proxy.lambda_handler(event, context)
+        wall_ms = (time.perf_counter() - started) * 1000.0
+        cpu_ms = (time.process_time() - cpu_started) * 1000.0
+        calls = Counter({f"dynamodb.{op}": count for op, count in (self.table.calls - dynamodb_before).items()})
+        calls['dynamodb.RCU'] = self.table.read_units - units_before[0]
+        calls['dynamodb.WCU'] = self.table.write_units - units_before[1]
+        calls['backend'] = self.pool.requests - requests_before
+        calls['post_to_connection'] = self.client.posts - posts_before
+        status = (response or {}).get('statusCode')
+        return wall_ms, cpu_ms, calls, status
+
+
+def peak_concurrency(arrivals_ms, durations_ms):
+    """Largest number of invocations in flight at once (each occupies one execution environment)."""
+    running, peak = [], 0
+    for arrival, duration in sorted(zip(arrivals_ms, durations_ms)):
+        while running and running[0] <= arrival:
+            heapq.heappop(running)
+        heapq.heappush(running, arrival + duration)
+        peak = max(peak, len(running))
+    return peak
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def print_histogram(route, timings):
+    ordered = sorted(timings)
+    print(f"\n{route}  {len(ordered)} events  p50 {percentile(ordered, 0.5):.2f}ms  "
+          f"p95 {percentile(ordered, 0.95):.2f}ms  p99 {percentile(ordered, 0.99):.2f}ms  max {ordered[-1]:.2f}ms")
+    counts = Counter(bisect.bisect_left(HISTOGRAM_BUCKETS_MS, value) for value in ordered)
+    widest = max(counts.values())
+    for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+        if not counts[index]:
+            continue
+        label = f"<= {bound:g}ms" if bound != float('inf') else f"> {HISTOGRAM_BUCKETS_MS[-2]:g}ms"
+        print(f"  {label:>10} {counts[index]:>8}  {'#' * max(1, round(40 * counts[index] / widest))}")
+
+
+def generate_trace(path, connections, duration_s, messages_per_connection, ping_interval_s, seed):
+    """Synthetic peak-hour trace: chat connections in pairs per booking, chatting and pinging."""
+    rng = random.Random(seed)
+    start_ms = int(time.time() * 1000)
+    records = []
+    for index in range(connections):
+        connection_id = f"conn-{index}"
+        booking_id = f"booking-{index // 2}"
+        opened = start_ms + int(rng.uniform(0, duration_s * 0.5) * 1000)
+        closed = opened + int(rng.uniform(duration_s * 0.2, duration_s * 0.5) * 1000)
+        records.append({'time_ms': opened, 'route_key': '$connect', 'connection_id': connection_id,
+                        'connection_type': 'chat', 'booking_id': booking_id, 'user_id': str(index + 10)})
+        for _ in range(rng.randint(0, messages_per_connection * 2)):
+            records.append({'time_ms': rng.randint(opened + 1, closed - 1), 'route_key': '$default',
+                            'connection_id': connection_id, 'body_size': int(rng.lognormvariate(5, 0.8))})
+        for ping_at in range(opened + ping_interval_s * 1000, closed, ping_interval_s * 1000):
+            records.append({'time_ms': ping_at, 'route_key': websocket_proxy.PING_ROUTE_KEY,
+                            'connection_id': connection_id})
+        records.append({'time_ms': closed, 'route_key': '$disconnect', 'connection_id': connection_id})
+    records.sort(key=lambda record: record['time_ms'])
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as handle:
+        for record in records:
+            handle.write(json.dumps(record) + '\n')
+    print(f"wrote {len(records)} events for {connections} connections over {duration_s}s to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', nargs='?', help='JSONL trace to replay')
+    parser.add_argument('--speed', type=float, default=1.0, help='time compression (1 = original pace, 0 = no pacing)')
+    parser.add_argument('--backend-latency-ms', type=float, default=0.0)
+    parser.add_argument('--dynamodb-latency-ms', type=float, default=0.0, help='added to every DynamoDB read')
+    parser.add_argument('--timeout-ms', type=int, default=30000, help='Lambda timeout (modules/websocket_lambda)')
+    parser.add_argument('--generate', metavar='PATH', help='write a synthetic trace to PATH instead of replaying')
+    parser.add_argument('--connections', type=int, default=200, help='--generate: connections in the trace')
+    parser.add_argument('--duration', type=int, default=600, help='--generate: trace length in seconds')
+    parser.add_argument('--messages', type=int, default=5, help='--generate: mean chat messages per connection')
+    parser.add_argument('--ping-interval', type=int, default=60, help='--generate: heartbeat period in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_trace(args.generate, args.connections, args.duration, args.messages, args.ping_interval, args.seed)
+        return
+    if not args.trace:
+        parser.error('a trace file (or --generate PATH) is required')
+
+    records = load_trace(args.trace)
+    replayer = Replayer(args.backend_latency_ms, args.dynamodb_latency_ms, args.timeout_ms)
+    connections = {}
+
+    # Sessions already open when the capture started
+    opened = set()
+    for record in records:
+        connection_id = record['connection_id']
+        if connection_id not in opened and record['route_key'] not in ('$connect', '$disconnect'):
+            replayer.invoke(build_event({'route_key': '$connect', 'connection_id': connection_id,
+                                         'time_ms': record['time_ms']}, connections, 0), 'preconnect')
+        opened.add(connection_id)
+    replayer.table.reset_counters()
+    replayer.pool.requests = replayer.client.posts = 0
+
+    timings, cpu_timings = defaultdict(list), defaultdict(list)
+    calls_by_route, statuses = defaultdict(Counter), defaultdict(Counter)
+    arrivals_ms, durations_ms = [], []
+    first_ms = records[0]['time_ms'] if records else 0
+    started = time.perf_counter()
+    max_lag_ms = 0.0
+    for sequence, record in enumerate(records, 1):
+        offset_ms = (record['time_ms'] - first_ms) / args.speed if args.speed else None
+        if offset_ms is not None:
+            ahead_s = offset_ms / 1000.0 - (time.perf_counter() - started)
+            if ahead_s > 0:
+                time.sleep(ahead_s)
+            else:
+                max_lag_ms = max(max_lag_ms, -ahead_s * 1000.0)
+        route = record['route_key']
+        wall_ms, cpu_ms, calls, status = replayer.invoke(
+            build_event(record, connections, sequence), f"replay-{sequence}"
+        )
+        timings[route].append(wall_ms)
+        cpu_timings[route].append(cpu_ms)
+        calls_by_route[route].update(calls)
+        statuses[route][status] += 1
+        arrivals_ms.append(record['time_ms'] - first_ms if offset_ms is None else offset_ms)
+        durations_ms.append(wall_ms)
+    elapsed = time.perf_counter() - started
+
+    trace_s = (records[-1]['time_ms'] - first_ms) / 1000.0 if records else 0.0
+    print(f"replayed {len(records)} events ({trace_s:.0f}s of trace) in {elapsed:.1f}s at speed {args.speed:g}, "
+          f"{len(connections)} connections, max lag behind schedule {max_lag_ms:.0f}ms")
+
+    print("\nlatency per route (wall time of lambda_handler)")
+    for route in sorted(timings):
+        print_histogram(route, timings[route])
+
+    call_names = sorted({name for calls in calls_by_route.values() for name in calls})
+    print(f"\ncalls per event\n  {'route':<12} " + ' '.join(f"{name:>20}" for name in call_names) + '  status codes')
+    for route in sorted(calls_by_route):
+        events = len(timings[route])
+        row = ' '.join(f"{calls_by_route[route][name] / events:>20.3f}" for name in call_names)
+        print(f"  {route:<12} {row}  {dict(statuses[route])}")
+
+    # CPU-bound time stretches as memory (and with it CPU share) shrinks; waiting doesn't
+    print("\nestimated p95 duration by memory size (CPU time scaled by the vCPU share)")
+    for route in sorted(timings):
+        estimates = []
+        for memory_mb in MEMORY_SIZES_MB:
+            stretch = max(1.0, FULL_VCPU_MEMORY_MB / memory_mb)
+            durations = sorted(wall + cpu * (stretch - 1.0) for wall, cpu in zip(timings[route], cpu_timings[route]))
+            estimates.append(f"{memory_mb}MB {percentile(durations, 0.95):8.2f}ms")
+        print(f"  {route:<12} " + '  '.join(estimates))
+
+    if arrivals_ms:
+        window_s = max(1.0, (max(arrivals_ms) - min(arrivals_ms)) / 1000.0)
+        per_second = Counter(int(arrival // 1000) for arrival in arrivals_ms)
+        print(f"\narrivals: mean {len(arrivals_ms) / window_s:.1f}/s, peak {max(per_second.values())}/s; "
+              f"peak concurrent invocations {peak_concurrency(arrivals_ms, durations_ms)} "
+              f"(measured durations, {'scaled' if args.speed else 'original'} arrival times)")
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB, "
+          f"mean CPU share {sum(map(sum, cpu_timings.values())) / max(1e-9, sum(map(sum, timings.values()))):.0%}")
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    main()
@@ -10,36 +10,836 @@ API Gateway Management API.
 - Frontend must fetch history via HTTP GET /api/chat/bookings/{booking_id}
 - WebSocket is only for real-time updates (NEW_MESSAGE, reaction, etc.)
 """
+import time
+INIT_STARTED = time.perf_counter()
+import abc
+import contextlib
+import functools
+import importlib
 import json
 import os
-import boto3
-import urllib.request
-import urllib.error
+import sys
 import urllib.parse
 import logging
-import concurrent.futures
-from botocore.exceptions import ClientError
+import random
+import threading
+import queue
+from collections import OrderedDict, deque
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# ⚡ STRUCTURED LOGGING: one JSON object per line with the invocation's route, connection
+# and request id as fields. Hot-path calls pass %-style arguments, so a record below the
+# level is never formatted. LOG_SAMPLE_RATE of invocations log at DEBUG (per-send and
+# per-lookup detail) and payload bodies are redacted unless LOG_PAYLOADS is set.
+LOG_LEVEL = logging.getLevelNamesMapping().get(os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.01'))
+LOG_PAYLOADS = os.environ.get('LOG_PAYLOADS', 'false').lower() in ('1', 'true', 'yes')
+
+# The Lambda runtime's handler sits on the root logger; the proxy logs through its own
+# logger so sampling (DEBUG) never reaches boto3/botocore/urllib3 - their DEBUG records
+# carry request params (post_to_connection Data, PutItem tokens) that redact() never sees
+logging.getLogger().setLevel(LOG_LEVEL)
+for library_logger in ('boto3', 'botocore', 'urllib3'):
+    logging.getLogger(library_logger).setLevel(max(LOG_LEVEL, logging.WARNING))
+logger = logging.getLogger('websocket_proxy')
+logger.setLevel(LOG_LEVEL)
+
+# Fields added to every record of the current invocation (see begin_invocation_logging())
+log_context = {}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Render a record as one JSON line: level, message, invocation context, exception."""
+    
+    def format(self, record):
+        entry = {
+            'timestamp': int(record.created * 1000),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        entry.update(log_context)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# The Lambda runtime installs the root handler; only its output format changes
+for log_handler in logging.getLogger().handlers:
+    log_handler.setFormatter(JsonLogFormatter())
+
+
+def begin_invocation_logging(route_key: str, connection_id: str, request_id: str = None):
+    """Set the context fields of this invocation's records and decide whether it is sampled at DEBUG."""
+    log_context.clear()
+    log_context['route'] = route_key
+    log_context['connection_id'] = connection_id
+    if request_id:
+        log_context['request_id'] = request_id
+    sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+    if sampled:
+        log_context['sampled'] = True
+    logger.setLevel(logging.DEBUG if sampled else LOG_LEVEL)
+
+
+class RedactedPayload:
+    """
+    Log argument standing in for a message or response body.
+    
+    Rendered only if the record is emitted; unless LOG_PAYLOADS is set it shows the
+    payload's shape (type, keys, size), never its content.
+    """
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __str__(self):
+        value = self.value
+        if LOG_PAYLOADS:
+            return str(value)
+        if isinstance(value, dict):
+            return f"<redacted type={value.get('type')} keys={sorted(map(str, value))}>"
+        if isinstance(value, (str, bytes)):
+            return f"<redacted {len(value)} chars>"
+        return f"<redacted {type(value).__name__}>"
+
+
+def redact(value):
+    """Wrap a payload for logging (see RedactedPayload)."""
+    return RedactedPayload(value)
+
+# ⚡ COLD START PROFILE: milliseconds per import and per client creation, logged as one
+# JSON line after the container's first invocation. boto3, botocore.config,
+# http.client, concurrent.futures and sqlite3 are imported on first use (lazy_import)
+# and clients are created by the route that first needs them, so $disconnect doesn't
+# build a Management API client and no route pays for imports it never uses.
+init_timings = OrderedDict()
+init_timings['import stdlib'] = round((time.perf_counter() - INIT_STARTED) * 1000.0, 2)
+init_report_emitted = False
+lazy_init_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def init_timer(name: str):
+    """Record how long the wrapped import / client creation took in the cold start profile."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = round((time.perf_counter() - started) * 1000.0, 2)
+        init_timings[name] = elapsed_ms
+        if init_report_emitted:
+            logger.info(f"Lazy init {name}: {elapsed_ms}ms")
+
+
+def lazy_import(module_name: str):
+    """Import a module on first use (timed in the cold start profile)."""
+    module = sys.modules.get(module_name)
+    if module is None:
+        with init_timer(f"import {module_name}"):
+            module = importlib.import_module(module_name)
+    return module
+
+
+def emit_init_report(route_key: str = None):
+    """Log the cold start profile once per container (after its first invocation)."""
+    global init_report_emitted
+    if init_report_emitted:
+        return
+    init_report_emitted = True
+    logger.info(json.dumps({
+        'init_report': {
+            'first_route': route_key,
+            'module_ms': init_timings.get('module'),
+            'timings_ms': dict(init_timings)
+        }
+    }))
+
+
+# Needed by except clauses throughout; much lighter than boto3 itself
+with init_timer('import botocore.exceptions'):
+    from botocore.exceptions import ClientError
 
 # Configuration from environment variables
 BACKEND_URL = os.environ.get('BACKEND_URL', 'http://44.206.238.155:8000')
 CONNECTIONS_TABLE = os.environ.get('CONNECTIONS_TABLE', 'websocket-connections')
+# Connection registry backend: dynamodb (production), or memory / sqlite for local runs
+# and profiling without AWS (CONNECTION_STORE_PATH is the SQLite database file)
+CONNECTION_STORE = os.environ.get('CONNECTION_STORE', 'dynamodb').lower()
+CONNECTION_STORE_PATH = os.environ.get('CONNECTION_STORE_PATH', ':memory:')
+# Negative-result backoff: once a data-plane call shows the table is missing or not
+# accessible, registry access is skipped for this long (doubling per failure up to the max)
+CONNECTIONS_TABLE_RETRY_SECONDS = float(os.environ.get('CONNECTIONS_TABLE_RETRY_SECONDS', '5'))
+CONNECTIONS_TABLE_RETRY_MAX_SECONDS = float(os.environ.get('CONNECTIONS_TABLE_RETRY_MAX_SECONDS', '300'))
+# GSI keyed by connection_id (see modules/websocket_lambda/main.tf) - lets $default and
+# $disconnect find a connection's row with a Query instead of a full-table scan
+CONNECTION_ID_INDEX = os.environ.get('CONNECTION_ID_INDEX', 'connection_id-index')
+# GSI keyed by booking_id + type_key ("<connection_type>#<connection_id>") - recipient lookups
+# select one connection type with begins_with instead of reading and filtering every row
+TYPE_KEY_INDEX = os.environ.get('TYPE_KEY_INDEX', 'type_key-index')
+# Recipient lookup mode:
+#   legacy - base-table query + FilterExpression on connection_type; finds every row, including
+#            rows written before type_key existed (rollout / backfill window)
+#   typed  - type_key-index query only (once every live row carries type_key); falls back to
+#            the legacy query while the index is missing or backfilling
+RECIPIENT_KEY_MODE = os.environ.get('RECIPIENT_KEY_MODE', 'legacy').lower()
+# Rows per recipient Query page. Pages are read lazily while the broadcast is already
+# sending, so a small first page gets the first post_to_connection out sooner
+RECIPIENT_QUERY_PAGE_SIZE = int(os.environ.get('RECIPIENT_QUERY_PAGE_SIZE', '500'))
+# Partition queries of one multi-key recipient lookup (booking, owner, renter, ...) run
+# concurrently on this many threads instead of one after another
+REGISTRY_LOOKUP_WORKERS = int(os.environ.get('REGISTRY_LOOKUP_WORKERS', '4'))
+# Heartbeat route ({"action": "ping"}). Answered from the handler's return value via the
+# route response - no registry read, no backend call, no post_to_connection
+PING_ROUTE_KEY = os.environ.get('PING_ROUTE_KEY', 'ping')
+PONG_BODY = json.dumps({'type': 'pong'})
 
-# Get AWS region from boto3 session (AWS_REGION is reserved and auto-set by Lambda)
-try:
-    AWS_REGION = boto3.Session().region_name or 'us-east-1'
-except Exception:
-    AWS_REGION = 'us-east-1'
+# Warm-container cache of connection metadata (booking_id, token, connection_type, user_id)
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', '5000'))
+METADATA_CACHE_TTL_SECONDS = int(os.environ.get('METADATA_CACHE_TTL_SECONDS', '300'))
+
+# Warm-container cache of booking participants (owner_id, renter_id) used by chat broadcasts
+PARTICIPANTS_CACHE_SIZE = int(os.environ.get('PARTICIPANTS_CACHE_SIZE', '1000'))
+PARTICIPANTS_CACHE_TTL_SECONDS = int(os.environ.get('PARTICIPANTS_CACHE_TTL_SECONDS', '600'))
+
+# Broadcast fan-out concurrency; the management API client's HTTPS pool is sized to match
+# so parallel post_to_connection calls don't queue for (or discard) pooled connections
+BROADCAST_MAX_WORKERS = int(os.environ.get('BROADCAST_MAX_WORKERS', '10'))
+APIGW_MAX_POOL_CONNECTIONS = int(os.environ.get('APIGW_MAX_POOL_CONNECTIONS', str(BROADCAST_MAX_WORKERS)))
+# More send threads than pooled connections would only queue for (or churn) connections
+FANOUT_WORKERS = max(1, min(BROADCAST_MAX_WORKERS, APIGW_MAX_POOL_CONNECTIONS))
+# Per-send deadline (connect/read timeout of each post_to_connection)
+FANOUT_SEND_TIMEOUT_SECONDS = float(os.environ.get('FANOUT_SEND_TIMEOUT_SECONDS', '2'))
+# Time kept back from the Lambda deadline so fan-out stops before the invocation is killed
+FANOUT_DEADLINE_RESERVE_MS = int(os.environ.get('FANOUT_DEADLINE_RESERVE_MS', '500'))
+# API Gateway WebSocket message size limit - larger post_to_connection calls are rejected
+MAX_PAYLOAD_BYTES = 128 * 1024
+
+# Keep-alive pool for backend calls. Idle timeout stays below the backend's keep-alive
+# timeout (uvicorn closes idle sockets after 5s) so we rarely pick up a closed socket
+BACKEND_POOL_MAXSIZE = int(os.environ.get('BACKEND_POOL_MAXSIZE', '10'))
+BACKEND_POOL_IDLE_SECONDS = float(os.environ.get('BACKEND_POOL_IDLE_SECONDS', '4'))
+# Backend call timeouts, per backend route (path template): BACKEND_TIMEOUT_SECONDS
+# until BACKEND_TIMEOUT_MIN_SAMPLES calls were seen, then the p99 of the last
+# BACKEND_LATENCY_WINDOW calls times BACKEND_TIMEOUT_MULTIPLIER, kept within
+# [BACKEND_TIMEOUT_MIN_SECONDS, BACKEND_TIMEOUT_MAX_SECONDS]
+BACKEND_TIMEOUT_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_SECONDS', '3'))
+BACKEND_TIMEOUT_MULTIPLIER = float(os.environ.get('BACKEND_TIMEOUT_MULTIPLIER', '3'))
+BACKEND_TIMEOUT_MIN_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_MIN_SECONDS', '0.25'))
+BACKEND_TIMEOUT_MAX_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_MAX_SECONDS', '3'))
+BACKEND_LATENCY_WINDOW = int(os.environ.get('BACKEND_LATENCY_WINDOW', '200'))
+BACKEND_TIMEOUT_MIN_SAMPLES = int(os.environ.get('BACKEND_TIMEOUT_MIN_SAMPLES', '20'))
+# Time a backend call leaves of the invocation for the fan-out that follows it
+BACKEND_FANOUT_RESERVE_MS = int(os.environ.get('BACKEND_FANOUT_RESERVE_MS', '1000'))
+# Circuit breaker per backend origin: opens once at least BACKEND_BREAKER_MIN_CALLS calls of the
+# last BACKEND_BREAKER_WINDOW_SECONDS failed at a rate of BACKEND_BREAKER_FAILURE_RATE (network
+# errors, timeouts, 5xx), fails calls immediately for BACKEND_BREAKER_OPEN_SECONDS, then lets one
+# probe call through (half-open) - success closes it, failure opens it again
+BACKEND_BREAKER_FAILURE_RATE = float(os.environ.get('BACKEND_BREAKER_FAILURE_RATE', '0.5'))
+BACKEND_BREAKER_MIN_CALLS = int(os.environ.get('BACKEND_BREAKER_MIN_CALLS', '5'))
+BACKEND_BREAKER_WINDOW_SECONDS = float(os.environ.get('BACKEND_BREAKER_WINDOW_SECONDS', '30'))
+BACKEND_BREAKER_OPEN_SECONDS = float(os.environ.get('BACKEND_BREAKER_OPEN_SECONDS', '10'))
+
+# One CloudWatch embedded metric format (EMF) record per invocation: stage durations,
+# recipient/gone counts and cache hit ratios, dimensioned by Route and ConnectionType
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Shelfshack/WebSocketProxy')
+
+# AWS_REGION is reserved and auto-set by Lambda (no boto3 Session needed to read it)
+AWS_REGION = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
 
 # API Gateway Management API client for sending messages back to clients
-# Will be initialized with endpoint URL when API Gateway endpoint is available
+# Created on first send of an invocation (see get_management_client())
 apigw_management = None
+# Management API endpoint of the current invocation
+apigw_endpoint_url = None
+
+# time.monotonic() deadline for the current invocation (from context.get_remaining_time_in_millis())
+invocation_deadline = None
 
-# DynamoDB client for connection tracking
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+# Management API clients by endpoint URL - reused across warm invocations so endpoint
+# resolution, service model loading and the HTTPS connection pool aren't redone per event
+apigw_clients = {}
+
+# DynamoDB resource for connection tracking (created on first registry access)
+dynamodb = None
+dynamodb_client = None
 connections_table = None
+# Connection registry backend (see get_connection_store())
+connection_store = None
+
+# Thread pool for concurrent registry queries - created on first use, reused by warm invocations
+registry_lookup_executor = None
+registry_lookup_lock = threading.Lock()
+
+
+class InvocationMetrics:
+    """
+    Stage timings and counters of the current invocation, written as one EMF record.
+    
+    A stage that runs several times (two backend calls, partition queries) accumulates.
+    Stage durations, recipients, gone connections, backend calls rejected by the circuit
+    breaker and cache hit ratios become CloudWatch metrics; the remaining counters and
+    properties are only fields of the log record (queryable with Logs Insights, no
+    custom metric cost).
+    """
+    
+    METRIC_COUNTERS = ('recipients', 'gone', 'backend_rejected')
+    CACHES = ('metadata', 'participants')
+    
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.begin()
+    
+    def begin(self, route_key: str = None, request_id: str = None):
+        """Start a new invocation's record."""
+        with self._lock:
+            self.started = time.perf_counter()
+            self.dimensions = {'Route': route_key or 'unknown', 'ConnectionType': 'unknown'}
+            self.stages = {}
+            self.counters = {}
+            self.properties = {'request_id': request_id} if request_id else {}
+    
+    def set_dimension(self, name: str, value):
+        with self._lock:
+            self.dimensions[name] = str(value) if value else 'unknown'
+    
+    def set_property(self, name: str, value):
+        with self._lock:
+            self.properties[name] = value
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time the wrapped block as stage `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, (time.perf_counter() - started) * 1000.0)
+    
+    def add_stage(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+    
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def cache_lookup(self, cache_name: str, hit: bool):
+        self.count(f"{cache_name}_cache_{'hits' if hit else 'misses'}")
+    
+    def record(self):
+        """
+        Build the EMF record of the current invocation.
+        
+        Returns:
+            Dict with the _aws metric directive, dimensions, metric values and properties
+        """
+        with self._lock:
+            values = {f"{name}_ms": round(ms, 2) for name, ms in self.stages.items()}
+            values['total_ms'] = round((time.perf_counter() - self.started) * 1000.0, 2)
+            metrics = [{'Name': name, 'Unit': 'Milliseconds'} for name in values]
+            for name in self.METRIC_COUNTERS:
+                if name in self.counters:
+                    values[name] = self.counters[name]
+                    metrics.append({'Name': name, 'Unit': 'Count'})
+            for cache_name in self.CACHES:
+                hits = self.counters.get(f"{cache_name}_cache_hits", 0)
+                lookups = hits + self.counters.get(f"{cache_name}_cache_misses", 0)
+                if lookups:
+                    values[f"{cache_name}_cache_hit_ratio"] = round(hits / lookups, 3)
+                    metrics.append({'Name': f"{cache_name}_cache_hit_ratio", 'Unit': 'None'})
+            record = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [list(self.dimensions)],
+                        'Metrics': metrics
+                    }]
+                }
+            }
+            record.update(self.properties)
+            record.update(self.counters)
+            record.update(self.dimensions)
+            record.update(values)
+            return record
+    
+    def emit(self):
+        """Write the record to stdout as its own line - CloudWatch extracts the metrics."""
+        sys.stdout.write(json.dumps(self.record(), separators=(',', ':'), default=str) + '\n')
+        sys.stdout.flush()
+
+
+# Per-invocation metrics (reset by lambda_handler, emitted when it returns)
+metrics = InvocationMetrics(METRICS_NAMESPACE)
+
+
+def timed_stage(name: str):
+    """Decorator: time every call of the function as stage `name` of the invocation's metrics."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with a per-entry TTL.
+    
+    Lives in module scope, so it survives across invocations served by the same
+    warm Lambda container. Thread-safe (broadcast sends run on worker threads).
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def stats(self):
+        """Hit/miss counters since the container started."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Connection metadata known at $connect - saves a DynamoDB round trip per chat message
+metadata_cache = TTLCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL_SECONDS)
+
+# Booking participants rarely change - saves the /participants call on most chat broadcasts
+participants_cache = TTLCache(PARTICIPANTS_CACHE_SIZE, PARTICIPANTS_CACHE_TTL_SECONDS)
+
+
+class BackendConnectionPool:
+    """
+    Keep-alive HTTP(S) connection pool for backend calls, kept for the container's lifetime.
+    
+    Idle connections are pooled per (scheme, host, port), capped at max_size per host,
+    and evicted once they have been idle for idle_seconds. Chat messages make two
+    backend calls back to back, so reuse removes most TCP/TLS handshakes.
+    """
+    
+    def __init__(self, max_size: int, idle_seconds: float):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+    
+    def _acquire(self, key):
+        """Pop the most recently used live connection for key, or open a new one."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_seconds:
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+            self.created += 1
+        scheme, host, port = key
+        http_client = lazy_import('http.client')
+        connection_class = http_client.HTTPSConnection if scheme == 'https' else http_client.HTTPConnection
+        return connection_class(host, port), False
+    
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+    
+    def request(self, method: str, url: str, body: bytes = None, headers: dict = None, timeout: float = None):
+        """
+        Send a request over a pooled connection.
+        
+        Returns:
+            (status_code, response body bytes)
+        
+        Raises:
+            OSError / http.client.HTTPException on network errors (including timeouts)
+        """
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        key = (parts.scheme, parts.hostname, parts.port)
+        
+        while True:
+            conn, reused = self._acquire(key)
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    # Backend closed the idle keep-alive socket before our request reached it -
+                    # nothing was processed, so retry on another (eventually fresh) connection
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return response.status, data
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': sum(len(idle) for idle in self._idle.values())
+            }
+
+
+backend_pool = BackendConnectionPool(BACKEND_POOL_MAXSIZE, BACKEND_POOL_IDLE_SECONDS)
+
+
+class BackendTimeouts:
+    """
+    Per-route backend timeouts derived from recent latencies, capped by the invocation deadline.
+    
+    Each route (path template, e.g. '/api/chat/ws/{}/message') keeps its last `window`
+    latencies for the container's lifetime. A call that times out is recorded at its
+    timeout, so a backend that slows down raises its own p99 (and with it the next
+    timeout) instead of failing at a stale budget.
+    
+    Budgets reported per call:
+    - default:   too few samples yet, default_seconds
+    - adaptive:  p99 x multiplier, clamped to [min_seconds, max_seconds]
+    - deadline:  cut short by the time left before the invocation must start its fan-out
+    - exhausted: no time left at all - the call is not made
+    """
+    
+    def __init__(self, default_seconds: float, multiplier: float, min_seconds: float, max_seconds: float,
+                 window: int, min_samples: int):
+        self.default_seconds = default_seconds
+        self.multiplier = multiplier
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, route: str, seconds: float):
+        with self._lock:
+            latencies = self._latencies.get(route)
+            if latencies is None:
+                latencies = self._latencies[route] = deque(maxlen=self.window)
+            latencies.append(seconds)
+    
+    def p99(self, route: str):
+        """p99 latency in seconds of the route's window (None below min_samples)."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(route, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    
+    def budget(self, route: str, deadline: float = None, reserve_seconds: float = 0.0):
+        """
+        Pick the timeout for the next call to route.
+        
+        Args:
+            route: Backend route (path template with IDs as {})
+            deadline: time.monotonic() cutoff of the invocation (None outside a handler)
+            reserve_seconds: Time to leave before the deadline for work after the call
+        
+        Returns:
+            (timeout in seconds or None if the call must not be made, budget name)
+        """
+        p99 = self.p99(route)
+        if p99 is None:
+            timeout, budget = self.default_seconds, 'default'
+        else:
+            timeout = min(self.max_seconds, max(self.min_seconds, p99 * self.multiplier))
+            budget = 'adaptive'
+        if deadline is not None:
+            remaining = deadline - time.monotonic() - reserve_seconds
+            if remaining <= 0:
+                return None, 'exhausted'
+            if remaining < timeout:
+                timeout, budget = remaining, 'deadline'
+        return timeout, budget
+
+
+backend_timeouts = BackendTimeouts(
+    BACKEND_TIMEOUT_SECONDS, BACKEND_TIMEOUT_MULTIPLIER, BACKEND_TIMEOUT_MIN_SECONDS,
+    BACKEND_TIMEOUT_MAX_SECONDS, BACKEND_LATENCY_WINDOW, BACKEND_TIMEOUT_MIN_SAMPLES
+)
+
+
+class CircuitBreaker:
+    """
+    Per-origin circuit breaker for backend calls, kept for the container's lifetime.
+    
+    While the backend task restarts every call would otherwise wait out its timeout,
+    holding Lambda concurrency that the other routes need. States per origin:
+    - closed:    calls go through; outcomes of the last window_seconds are kept
+    - open:      failure rate reached failure_rate over at least min_calls - calls fail
+                 immediately until open_seconds have passed
+    - half_open: one probe call goes through (others still fail fast); its outcome
+                 closes the breaker or opens it again
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_rate: float, min_calls: int, window_seconds: float, open_seconds: float):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._circuits = {}
+        self._lock = threading.Lock()
+    
+    def _circuit(self, origin: str):
+        circuit = self._circuits.get(origin)
+        if circuit is None:
+            circuit = self._circuits[origin] = {
+                'state': self.CLOSED, 'outcomes': deque(), 'failures': 0, 'opened_at': 0.0, 'probing': False
+            }
+        return circuit
+    
+    def allow(self, origin: str):
+        """
+        Decide whether a call to origin may be made now.
+        
+        Returns:
+            (allowed, state the call ran under)
+        """
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(origin)
+            if circuit['state'] == self.OPEN and now - circuit['opened_at'] >= self.open_seconds:
+                circuit['state'] = self.HALF_OPEN
+                circuit['probing'] = False
+            if circuit['state'] == self.CLOSED:
+                return True, self.CLOSED
+            if circuit['state'] == self.HALF_OPEN and not circuit['probing']:
+                circuit['probing'] = True
+                return True, self.HALF_OPEN
+            return False, circuit['state']
+    
+    def record(self, origin: str, success: bool):
+        """Record a call's outcome; returns the state afterwards."""
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(origin)
+            previous = circuit['state']
+            if previous == self.HALF_OPEN:
+                circuit['probing'] = False
+                circuit['outcomes'].clear()
+                circuit['failures'] = 0
+                if success:
+                    circuit['state'] = self.CLOSED
+                else:
+                    circuit['state'], circuit['opened_at'] = self.OPEN, now
+            elif previous == self.CLOSED:
+                # Running failure count - no rescan of the window per call
+                outcomes = circuit['outcomes']
+                outcomes.append((now, success))
+                circuit['failures'] += not success
+                while now - outcomes[0][0] > self.window_seconds:
+                    circuit['failures'] -= not outcomes.popleft()[1]
+                if len(outcomes) >= self.min_calls and circuit['failures'] / len(outcomes) >= self.failure_rate:
+                    circuit['state'], circuit['opened_at'] = self.OPEN, now
+                    outcomes.clear()
+                    circuit['failures'] = 0
+            state = circuit['state']
+        if state != previous:
+            logger.warning("Backend circuit for %s: %s -> %s", origin, previous, state)
+        return state
+
+
+backend_breaker = CircuitBreaker(
+    BACKEND_BREAKER_FAILURE_RATE, BACKEND_BREAKER_MIN_CALLS, BACKEND_BREAKER_WINDOW_SECONDS, BACKEND_BREAKER_OPEN_SECONDS
+)
+
+
+class FanoutEngine:
+    """
+    Delivers one payload to many connections in parallel.
+    
+    Used by chat broadcasts, notification broadcasts and broadcast_message(). Sends run
+    on a long-lived executor (created on first use, reused by warm invocations) and are
+    pipelined across all recipients. Each send is bounded by the management client's
+    timeouts; the whole broadcast is bounded by the invocation deadline.
+    """
+    
+    THROTTLE_ERRORS = ('LimitExceededException', 'TooManyRequestsException', 'ThrottlingException')
+    OUTCOME_COUNTS = ('delivered', 'throttled', 'failed', 'expired')
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = lazy_import('concurrent.futures').ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='fanout'
+                )
+            return self._executor
+    
+    def _send(self, client, connection_id, payload, deadline):
+        """Send pre-encoded bytes to one connection and classify the outcome."""
+        if deadline is not None and time.monotonic() >= deadline:
+            return 'expired'
+        try:
+            client.post_to_connection(
+                ConnectionId=connection_id,
+                Data=payload
+            )
+            return 'delivered'
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code', '')
+            if error_code == 'GoneException':
+                return 'gone'
+            if error_code in self.THROTTLE_ERRORS:
+                logger.warning("Throttled sending to connection %s: %s", connection_id, error_code)
+                return 'throttled'
+            logger.error("Failed to send to connection %s: %s", connection_id, e)
+            return 'failed'
+        except Exception as e:
+            logger.error("Failed to send to connection %s: %s", connection_id, e)
+            return 'failed'
+    
+    def broadcast(self, connection_ids, data, deadline=None):
+        """
+        Send data to every connection.
+        
+        connection_ids may be a lazy iterator (e.g. iter_connections_for_keys()): each
+        ID is submitted as soon as it is produced, so sends to the first page of
+        recipients run while later pages are still being read from DynamoDB.
+        
+        Args:
+            connection_ids: Connection IDs to deliver to (any iterable)
+            data: JSON-serializable payload, or bytes already produced by encode_payload()
+            deadline: time.monotonic() cutoff (default: the current invocation's deadline)
+        
+        Returns:
+            Dict with delivered/throttled/failed/expired counts and the list of gone connection IDs
+        """
+        with metrics.stage('fanout'):
+            results = self._broadcast(connection_ids, data, deadline)
+        metrics.count('recipients', sum(results[outcome] for outcome in self.OUTCOME_COUNTS) + len(results['gone']))
+        metrics.count('gone', len(results['gone']))
+        for outcome in self.OUTCOME_COUNTS:
+            if results[outcome]:
+                metrics.count(outcome, results[outcome])
+        return results
+    
+    def _broadcast(self, connection_ids, data, deadline):
+        """broadcast() without the metrics bookkeeping."""
+        results = {'delivered': 0, 'gone': [], 'throttled': 0, 'failed': 0, 'expired': 0}
+        
+        client = get_management_client()
+        if client is None:
+            # Don't drain a lazy recipient source just to count it - that would run every
+            # registry query (and the participants lookup) for a broadcast that can't be sent
+            results['failed'] = len(connection_ids) if hasattr(connection_ids, '__len__') else 0
+            if hasattr(connection_ids, 'close'):
+                connection_ids.close()
+            metrics.count('fanout_no_client')
+            logger.error("API Gateway Management API client missing (endpoint %s), broadcast not sent",
+                         apigw_endpoint_url or 'not set')
+            return results
+        
+        if deadline is None:
+            deadline = invocation_deadline
+        
+        # Serialize once per broadcast, not once per recipient (and only if there is a recipient)
+        payload = data if isinstance(data, bytes) else None
+        
+        futures = {}
+        for conn_id in connection_ids:
+            if deadline is not None and time.monotonic() >= deadline:
+                # Out of time - stop reading further recipient pages
+                logger.warning("Fan-out deadline reached after %d recipients, remaining recipients not read", len(futures))
+                break
+            if payload is None:
+                payload = encode_payload(data)
+            futures[self.executor.submit(self._send, client, conn_id, payload, deadline)] = conn_id
+        if not futures:
+            return results
+        
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        done, not_done = lazy_import('concurrent.futures').wait(futures, timeout=timeout)
+        
+        for future in done:
+            outcome = future.result()
+            if outcome == 'gone':
+                results['gone'].append(futures[future])
+            else:
+                results[outcome] += 1
+        for future in not_done:
+            # Out of time - drop sends that haven't started; running ones finish in the background
+            future.cancel()
+            results['expired'] += 1
+        
+        logger.info("Fan-out complete: %d connections, delivered=%d, gone=%d, throttled=%d, failed=%d, expired=%d",
+                    len(futures), results['delivered'], len(results['gone']), results['throttled'],
+                    results['failed'], results['expired'])
+        return results
+
+
+fanout_engine = FanoutEngine(FANOUT_WORKERS)
 
 
 def lambda_handler(event, context):
@@ -53,38 +853,41 @@ def lambda_handler(event, context):
     """
     route_key = event.get('requestContext', {}).get('routeKey')
     connection_id = event.get('requestContext', {}).get('connectionId')
+    request_id = getattr(context, 'aws_request_id', None)
+    begin_invocation_logging(route_key, connection_id, request_id)
+    metrics.begin(route_key, request_id)
     domain_name = event.get('requestContext', {}).get('domainName')
     stage = event.get('requestContext', {}).get('stage')
     
-    # Initialize API Gateway Management API client
-    global apigw_management
+    # Fan-out must finish before Lambda's own timeout (keep a reserve for the response)
+    global invocation_deadline
+    invocation_deadline = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        invocation_deadline = time.monotonic() + (context.get_remaining_time_in_millis() - FANOUT_DEADLINE_RESERVE_MS) / 1000.0
+    
+    # Select the API Gateway Management API endpoint for this invocation
+    global apigw_management, apigw_endpoint_url
     
     # Use endpoint from environment variable if set, otherwise construct from event
     api_endpoint = os.environ.get('API_GATEWAY_ENDPOINT')
     if not api_endpoint and domain_name and stage:
         api_endpoint = f"https://{domain_name}/{stage}"
     
-    # Initialize client - always recreate to ensure correct endpoint
-    # (client is lightweight, so this is safe and avoids config access issues)
-    if api_endpoint:
-        try:
-            apigw_management = boto3.client(
-                'apigatewaymanagementapi',
-                endpoint_url=api_endpoint,
-                region_name=AWS_REGION
-            )
-            logger.info(f"Initialized API Gateway Management API client with endpoint: {api_endpoint}")
-        except Exception as e:
-            logger.error(f"Failed to initialize API Gateway Management API client: {e}")
-            apigw_management = None
-    else:
+    # The client itself is created on the first send (cached per endpoint), so routes
+    # that never send - $disconnect - don't pay for it
+    apigw_endpoint_url = api_endpoint
+    apigw_management = apigw_clients.get(api_endpoint) if api_endpoint else None
+    if not api_endpoint:
         logger.warning("API Gateway endpoint not available, client not initialized")
-        apigw_management = None
     
-    logger.info(f"Route: {route_key}, Connection ID: {connection_id}")
+    # Keep-alives are most of the invocation volume: their route line is DEBUG only (and they write no EMF record)
+    logger.log(logging.DEBUG if route_key == PING_ROUTE_KEY else logging.INFO,
+               "Route: %s, Connection ID: %s", route_key, connection_id)
     
     try:
-        if route_key == '$connect':
+        if route_key == PING_ROUTE_KEY:
+            return handle_ping(event, connection_id)
+        elif route_key == '$connect':
             return handle_connect(event, connection_id)
         elif route_key == '$disconnect':
             return handle_disconnect(event, connection_id)
@@ -99,6 +902,14 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
         }
+    finally:
+        # Don't let this invocation's deadline leak into calls made outside a handler
+        invocation_deadline = None
+        emit_init_report(route_key)
+        # Heartbeats are counted by API Gateway's per-route metrics - keep the cheapest
+        # route free of the extra log line
+        if METRICS_ENABLED and route_key != PING_ROUTE_KEY:
+            metrics.emit()
 
 
 def handle_connect(event, connection_id):
@@ -111,21 +922,23 @@ def handle_connect(event, connection_id):
     booking_id = query_params.get('booking_id')
     token = query_params.get('token')
     connection_type = query_params.get('type', 'booking')  # booking, chat, notification, feed
+    metrics.set_dimension('ConnectionType', connection_type)
     
     # Log connection details for debugging
-    logger.info(f"Connection: type={connection_type}, booking_id={booking_id}, connection_id={connection_id}, has_token={bool(token)}, token_length={len(token) if token else 0}")
+    logger.info("Connection: type=%s, booking_id=%s, connection_id=%s, has_token=%s",
+                connection_type, booking_id, connection_id, bool(token))
     
     # URL decode token if needed (API Gateway may URL-encode query params)
     if token:
         import urllib.parse
         token = urllib.parse.unquote(token)
-        logger.debug(f"Token after URL decode: length={len(token)}, preview={token[:20]}...{token[-10:] if len(token) > 30 else ''}")
+        logger.debug("Token after URL decode: length=%d", len(token))
     
     # ⚡ SINGLE WEBSOCKET PER USER: For chat connections, booking_id is optional in URL
     # booking_id will be in message payloads for routing
     # Validate required parameters
     if connection_type == 'booking' and not booking_id:
-        logger.warning(f"Missing booking_id for booking connection")
+        logger.warning("Missing booking_id for booking connection")
         return {
             'statusCode': 400,
             'body': json.dumps({'error': 'booking_id required for booking connections'})
@@ -136,7 +949,7 @@ def handle_connect(event, connection_id):
     
     # Token is optional for feed, but required for booking, chat, and notification
     if connection_type in ['booking', 'chat', 'notification'] and not token:
-        logger.warning(f"Missing token for {connection_type} connection")
+        logger.warning("Missing token for %s connection", connection_type)
         return {
             'statusCode': 401,
             'body': json.dumps({'error': 'token required for booking/chat/notification connections'})
@@ -147,9 +960,8 @@ def handle_connect(event, connection_id):
     notification_initial_payload = None
     if connection_type == 'notification' and token:
         try:
-            # Log token info for debugging (without exposing full token)
-            token_preview = f"{token[:20]}...{token[-10:]}" if len(token) > 30 else token[:20]
-            logger.info(f"Notification connect: connection_id={connection_id}, token_length={len(token)}, token_preview={token_preview}")
+            # Log token info for debugging (length only - no token material in logs)
+            logger.info("Notification connect: connection_id=%s, token_length=%d", connection_id, len(token))
             
             # Validate token and get user_id + initial notifications from backend
             backend_response = forward_to_backend(
@@ -157,21 +969,22 @@ def handle_connect(event, connection_id):
                 {
                     'connection_id': connection_id,
                     'token': token
-                }
+                },
+                '/api/notifications/ws/connect'
             )
             if backend_response and backend_response.get('success') and backend_response.get('response'):
                 response_data = backend_response['response']
                 user_id = response_data.get('user_id')
                 notification_initial_payload = response_data.get('initial')
-                logger.info(f"Got user_id {user_id} for notification connection {connection_id}, has_initial={notification_initial_payload is not None}")
+                logger.info("Got user_id %s for notification connection %s, has_initial=%s", user_id, connection_id, notification_initial_payload is not None)
             else:
                 error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
-                logger.error(f"Backend notification connect failed: {error_msg}")
+                logger.error("Backend notification connect failed: %s", error_msg)
                 # Log more details for debugging
-                logger.error(f"Backend URL: {BACKEND_URL}/api/notifications/ws/connect")
-                logger.error(f"Token present: {bool(token)}, Token length: {len(token) if token else 0}")
+                logger.error("Backend URL: %s/api/notifications/ws/connect", BACKEND_URL)
+                logger.error("Token present: %s, Token length: %d", bool(token), len(token) if token else 0)
         except Exception as e:
-            logger.warning(f"Failed to validate token for notification connection: {e}", exc_info=True)
+            logger.warning("Failed to validate token for notification connection: %s", e, exc_info=True)
             # Still accept connection - user_id will be None
     
     # Store connection in DynamoDB for broadcasting (include token for message routing)
@@ -180,9 +993,9 @@ def handle_connect(event, connection_id):
             # Legacy: per-chat connection (still supported)
             try:
                 store_connection(connection_id, booking_id, user_id=None, connection_type=connection_type, token=token)
-                logger.info(f"Stored chat connection {connection_id} for booking {booking_id}")
+                logger.info("Stored chat connection %s for booking %s", connection_id, booking_id)
             except Exception as e:
-                logger.warning(f"Failed to store connection in DynamoDB: {e}")
+                logger.warning("Failed to store connection in DynamoDB: %s", e)
         else:
             # Single WebSocket per user: Store with user_id pattern
             # Get user_id from backend response (if available) or from token validation
@@ -190,36 +1003,36 @@ def handle_connect(event, connection_id):
                 # For single user connection, we need to validate token and get user_id
                 # This happens in the chat connect handler below
                 # We'll store it after we get the user_id from backend
-                logger.info(f"Single user chat connection (no booking_id) - will store after auth")
+                logger.info("Single user chat connection (no booking_id) - will store after auth")
             except Exception as e:
-                logger.warning(f"Failed to prepare single user chat connection storage: {e}")
+                logger.warning("Failed to prepare single user chat connection storage: %s", e)
     elif connection_type == 'booking' and booking_id:
         try:
             store_connection(connection_id, booking_id, user_id=None, connection_type=connection_type, token=token)
-            logger.info(f"Stored {connection_type} connection {connection_id} for booking {booking_id}")
+            logger.info("Stored %s connection %s for booking %s", connection_type, connection_id, booking_id)
         except Exception as e:
-            logger.warning(f"Failed to store connection in DynamoDB: {e}")
+            logger.warning("Failed to store connection in DynamoDB: %s", e)
             # Continue anyway - connection can still work without DynamoDB storage
     elif connection_type == 'notification' and user_id:
         # Store notification connection with special booking_id format: "user_{user_id}"
         try:
             store_connection(connection_id, f"user_{user_id}", user_id=user_id, connection_type='notification', token=token)
-            logger.info(f"Stored notification connection {connection_id} for user {user_id}")
+            logger.info("Stored notification connection %s for user %s", connection_id, user_id)
         except Exception as e:
-            logger.warning(f"Failed to store notification connection in DynamoDB: {e}")
+            logger.warning("Failed to store notification connection in DynamoDB: %s", e)
             # Continue anyway
     
     # For chat connections, call backend for authentication and connection validation only
     # ⚠️ CRITICAL: NO HISTORY LOADING - Frontend must fetch history via HTTP GET /api/chat/bookings/{booking_id}
     # This reduces $connect latency from 400-900ms to <50ms
     if connection_type == 'chat' and token:
-        logger.info(f"Calling backend for chat connect (auth only, no history): booking_id={booking_id or 'NONE (single WS per user)'}, connection_id={connection_id}")
+        logger.info("Calling backend for chat connect (auth only, no history): booking_id=%s, connection_id=%s", booking_id or 'NONE (single WS per user)', connection_id)
         try:
             # For single WebSocket per user, use generic endpoint (no booking_id)
             # For per-chat connections, use booking-specific endpoint
             if booking_id:
                 backend_url = f"{BACKEND_URL}/api/chat/ws/{booking_id}/connect"
-                logger.info(f"Backend URL: {backend_url}")
+                logger.info("Backend URL: %s", backend_url)
                 
                 # Call backend for authentication and validation only (fast, no history)
                 backend_response = forward_to_backend(
@@ -227,15 +1040,16 @@ def handle_connect(event, connection_id):
                     {
                         'connection_id': connection_id,
                         'token': token
-                    }
+                    },
+                    '/api/chat/ws/{}/connect'
                 )
-                logger.info(f"Backend response received: success={backend_response.get('success') if backend_response else False}")
+                logger.info("Backend response received: success=%s", backend_response.get('success') if backend_response else False)
                 
                 # Backend now returns minimal ACK: {user_id, booking_id, thread_id, status: "connected"}
                 # Send ACK to client (optional - connection is already established)
                 if backend_response and backend_response.get('success') and backend_response.get('response'):
                     response_data = backend_response['response']
-                    logger.info(f"Chat connect ACK: {response_data.get('status')}, user_id={response_data.get('user_id')}")
+                    logger.info("Chat connect ACK: %s, user_id=%s", response_data.get('status'), response_data.get('user_id'))
                     # Optionally send ACK to client (not required, but helpful for debugging)
                     try:
                         send_to_client(connection_id, {
@@ -245,37 +1059,38 @@ def handle_connect(event, connection_id):
                         })
                     except Exception as send_error:
                         # Connection might be closed - this is OK, frontend will use HTTP
-                        logger.warning(f"Failed to send ACK (connection may be closed): {send_error}")
+                        logger.warning("Failed to send ACK (connection may be closed): %s", send_error)
                 else:
                     error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
-                    logger.error(f"Backend auth failed: {error_msg}")
+                    logger.error("Backend auth failed: %s", error_msg)
             else:
                 # Single WebSocket per user - call generic connect endpoint
                 backend_url = f"{BACKEND_URL}/api/chat/ws/connect"
-                logger.info(f"Backend URL (generic): {backend_url}")
+                logger.info("Backend URL (generic): %s", backend_url)
                 
                 backend_response = forward_to_backend(
                     backend_url,
                     {
                         'connection_id': connection_id,
                         'token': token
-                    }
+                    },
+                    '/api/chat/ws/connect'
                 )
-                logger.info(f"Backend response received: success={backend_response.get('success') if backend_response else False}")
+                logger.info("Backend response received: success=%s", backend_response.get('success') if backend_response else False)
                 
                 # Send ACK to client and store connection with user_id pattern
                 if backend_response and backend_response.get('success') and backend_response.get('response'):
                     response_data = backend_response['response']
                     user_id = response_data.get('user_id')
-                    logger.info(f"Generic chat connect ACK: {response_data.get('status')}, user_id={user_id}")
+                    logger.info("Generic chat connect ACK: %s, user_id=%s", response_data.get('status'), user_id)
                     
                     # Store single user chat connection with user_id pattern
                     if user_id:
                         try:
                             store_connection(connection_id, f"user_{user_id}", user_id=user_id, connection_type='chat', token=token)
-                            logger.info(f"Stored single user chat connection {connection_id} for user {user_id}")
+                            logger.info("Stored single user chat connection %s for user %s", connection_id, user_id)
                         except Exception as e:
-                            logger.warning(f"Failed to store single user chat connection: {e}")
+                            logger.warning("Failed to store single user chat connection: %s", e)
                     
                     try:
                         send_to_client(connection_id, {
@@ -284,14 +1099,14 @@ def handle_connect(event, connection_id):
                             'message': 'WebSocket connected. Fetch chat history via HTTP GET /api/chat/bookings/{booking_id}'
                         })
                     except Exception as send_error:
-                        logger.warning(f"Failed to send ACK (connection may be closed): {send_error}")
+                        logger.warning("Failed to send ACK (connection may be closed): %s", send_error)
                 else:
                     error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
-                    logger.error(f"Backend auth failed: {error_msg}")
+                    logger.error("Backend auth failed: %s", error_msg)
             
             # Remove duplicate code below - it's now handled above
             if False:  # This block is now dead code, keeping for reference
-                logger.info(f"Backend URL: {backend_url}")
+                logger.info("Backend URL: %s", backend_url)
                 
                 # Call backend for authentication and validation only (fast, no history)
                 backend_response = forward_to_backend(
@@ -299,15 +1114,16 @@ def handle_connect(event, connection_id):
                     {
                         'connection_id': connection_id,
                         'token': token
-                    }
+                    },
+                    '/api/chat/ws/{}/connect'
                 )
-                logger.info(f"Backend response received: success={backend_response.get('success') if backend_response else False}")
+                logger.info("Backend response received: success=%s", backend_response.get('success') if backend_response else False)
                 
                 # Backend now returns minimal ACK: {user_id, booking_id, thread_id, status: "connected"}
                 # Send ACK to client (optional - connection is already established)
                 if backend_response and backend_response.get('success') and backend_response.get('response'):
                     response_data = backend_response['response']
-                    logger.info(f"Chat connect ACK: {response_data.get('status')}, user_id={response_data.get('user_id')}")
+                    logger.info("Chat connect ACK: %s, user_id=%s", response_data.get('status'), response_data.get('user_id'))
                     # Optionally send ACK to client (not required, but helpful for debugging)
                     try:
                         send_to_client(connection_id, {
@@ -317,48 +1133,49 @@ def handle_connect(event, connection_id):
                         })
                     except Exception as send_error:
                         # Connection might be closed - this is OK, frontend will use HTTP
-                        logger.warning(f"Failed to send ACK (connection may be closed): {send_error}")
+                        logger.warning("Failed to send ACK (connection may be closed): %s", send_error)
                 else:
                     error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
-                    logger.error(f"Backend auth failed: {error_msg}")
+                    logger.error("Backend auth failed: %s", error_msg)
         except Exception as e:
-            logger.error(f"Failed to authenticate chat connection: {e}", exc_info=True)
+            logger.error("Failed to authenticate chat connection: %s", e, exc_info=True)
             # Still accept connection - client can retry auth if needed
     
     # For booking status connections, call backend to get initial status
     if connection_type == 'booking' and booking_id and token:
-        logger.info(f"Calling backend for booking status connect: booking_id={booking_id}, connection_id={connection_id}")
+        logger.info("Calling backend for booking status connect: booking_id=%s, connection_id=%s", booking_id, connection_id)
         try:
             backend_url = f"{BACKEND_URL}/api/ws/bookings/{booking_id}/connect"
-            logger.info(f"Backend URL: {backend_url}")
+            logger.info("Backend URL: %s", backend_url)
             
             backend_response = forward_to_backend(
                 backend_url,
                 {
                     'connection_id': connection_id,
                     'token': token
-                }
+                },
+                '/api/ws/bookings/{}/connect'
             )
-            logger.info(f"Backend response received: success={backend_response.get('success') if backend_response else False}")
+            logger.info("Backend response received: success=%s", backend_response.get('success') if backend_response else False)
             
             # Send initial status to client
             if backend_response and backend_response.get('success') and backend_response.get('response'):
                 response_data = backend_response['response']
-                logger.info(f"Response data keys: {list(response_data.keys())}")
+                logger.info("Response data keys: %s", list(response_data.keys()))
                 if response_data.get('initial'):
-                    logger.info(f"Sending initial status to connection {connection_id}")
+                    logger.info("Sending initial status to connection %s", connection_id)
                     try:
                         send_to_client(connection_id, response_data['initial'])
-                        logger.info(f"Successfully sent initial status to {connection_id}")
+                        logger.info("Successfully sent initial status to %s", connection_id)
                     except Exception as send_error:
-                        logger.error(f"Failed to send initial status: {send_error}")
+                        logger.error("Failed to send initial status: %s", send_error)
                 else:
-                    logger.warning(f"No 'initial' key in response data: {response_data}")
+                    logger.warning("No 'initial' key in response data: %s", redact(response_data))
             else:
                 error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response'
-                logger.error(f"Backend call failed or invalid response: {error_msg}")
+                logger.error("Backend call failed or invalid response: %s", error_msg)
         except Exception as e:
-            logger.error(f"Failed to get initial status from backend: {e}", exc_info=True)
+            logger.error("Failed to get initial status from backend: %s", e, exc_info=True)
             # Still accept connection - client can request status separately if needed
     
     # For notification connections, send initial notifications to client
@@ -366,17 +1183,17 @@ def handle_connect(event, connection_id):
     if connection_type == 'notification':
         if notification_initial_payload:
             try:
-                logger.info(f"Sending initial notifications to connection {connection_id}, payload_type={type(notification_initial_payload)}, payload_keys={list(notification_initial_payload.keys()) if isinstance(notification_initial_payload, dict) else 'not_dict'}")
+                logger.info("Sending initial notifications to connection %s, payload_type=%s, payload_keys=%s", connection_id, type(notification_initial_payload), list(notification_initial_payload.keys()) if isinstance(notification_initial_payload, dict) else 'not_dict')
                 send_to_client(connection_id, notification_initial_payload)
-                logger.info(f"Successfully sent initial notifications to {connection_id}")
+                logger.info("Successfully sent initial notifications to %s", connection_id)
             except Exception as send_error:
                 # Connection might be closed - this is OK, frontend will use HTTP fallback
-                logger.warning(f"Failed to send initial notifications (connection may be closed): {send_error}", exc_info=True)
+                logger.warning("Failed to send initial notifications (connection may be closed): %s", send_error, exc_info=True)
         else:
-            logger.warning(f"No initial payload available for notification connection {connection_id} - frontend will use HTTP fallback")
+            logger.warning("No initial payload available for notification connection %s - frontend will use HTTP fallback", connection_id)
             # Log why we don't have the payload
             if 'backend_response' in locals():
-                logger.warning(f"Backend response: success={backend_response.get('success') if backend_response else False}, error={backend_response.get('error') if backend_response else 'No response'}")
+                logger.warning("Backend response: success=%s, error=%s", backend_response.get('success') if backend_response else False, backend_response.get('error') if backend_response else 'No response')
     
     # Accept the connection
     return {
@@ -392,8 +1209,8 @@ def handle_disconnect(event, connection_id):
     logger.info(f"Disconnection: connection_id={connection_id}")
     
     try:
-        # Remove connection from DynamoDB
-        remove_connection(connection_id, booking_id=None)  # booking_id=None will scan and remove
+        # Remove connection from DynamoDB (also evicts it from the metadata cache)
+        remove_connection(connection_id, booking_id=None)  # booking_id=None looks up the row via the connection_id index
     except Exception as e:
         logger.warning(f"Failed to remove connection from DynamoDB: {e}")
         # Continue anyway - connection is already closed
@@ -403,6 +1220,19 @@ def handle_disconnect(event, connection_id):
     }
 
 
+def handle_ping(event, connection_id):
+    """
+    Handle a heartbeat on the ping route.
+    
+    The route has a route response, so API Gateway sends this invocation's body back
+    to the client: no DynamoDB, backend or Management API call is made.
+    """
+    return {
+        'statusCode': 200,
+        'body': PONG_BODY
+    }
+
+
 def handle_message(event, connection_id):
     """
     Handle incoming WebSocket message from client.
@@ -423,23 +1253,35 @@ def handle_message(event, connection_id):
         # For single WebSocket per user, booking_id comes in message payload, not connection metadata
         booking_id_from_payload = message_data.get('booking_id')
         
-        # Get connection metadata from DynamoDB (stored during $connect)
+        # ⚡ Heartbeat that reached $default (stage deployed without the ping route):
+        # answer it before the metadata lookup - $default has no route response, so post the pong
+        if message_data.get('action') == PING_ROUTE_KEY:
+            send_to_client(connection_id, {'type': 'pong'})
+            return {
+                'statusCode': 200
+            }
+        
+        # Get connection metadata (stored during $connect) - served from the warm-container
+        # cache when possible, otherwise read through from DynamoDB
         # Query params aren't available in $default route, so we retrieve from DynamoDB
-        logger.info(f"Getting connection metadata for connection_id={connection_id}")
+        logger.debug("Getting connection metadata for connection_id=%s", connection_id)
         connection_metadata = get_connection_metadata(connection_id)
         if connection_metadata:
             booking_id = connection_metadata.get('booking_id')
             token = connection_metadata.get('token')
             connection_type = connection_metadata.get('connection_type', 'booking')
-            logger.info(f"Found connection metadata: type={connection_type}, booking_id={booking_id}, has_token={bool(token)}")
+            metrics.set_dimension('ConnectionType', connection_type)
+            logger.debug("Found connection metadata: type=%s, booking_id=%s, has_token=%s",
+                         connection_type, booking_id, bool(token))
         else:
             # For single WebSocket per user, connection might be stored with user_id pattern
             # Try to extract booking_id from message payload
             if booking_id_from_payload:
-                logger.info(f"Connection metadata not found, but booking_id in payload: {booking_id_from_payload}")
+                logger.info("Connection metadata not found, but booking_id in payload: %s", booking_id_from_payload)
                 # Try to get token from message (if provided)
                 token = message_data.get('token') or token
                 connection_type = 'chat'
+                metrics.set_dimension('ConnectionType', connection_type)
                 booking_id = booking_id_from_payload
             else:
                 logger.error(f"Could not retrieve connection metadata from DynamoDB for {connection_id} and no booking_id in payload.")
@@ -451,9 +1293,9 @@ def handle_message(event, connection_id):
         # Use booking_id from payload if available (for single WebSocket per user)
         if booking_id_from_payload:
             booking_id = booking_id_from_payload
-            logger.info(f"Using booking_id from message payload: {booking_id}")
+            logger.debug("Using booking_id from message payload: %s", booking_id)
         
-        logger.info(f"Message: type={connection_type}, booking_id={booking_id}, data={message_data}")
+        logger.info("Message: type=%s, booking_id=%s, data=%s", connection_type, booking_id, redact(message_data))
         
         # Forward message to appropriate backend endpoint
         backend_response = None
@@ -461,7 +1303,7 @@ def handle_message(event, connection_id):
         if connection_type == 'booking':
             # Booking status is one-way (backend -> client), so messages from client are not expected
             # But if client sends a message (e.g., ping/keepalive), just acknowledge it
-            logger.info(f"Booking status connection received message (likely keepalive): {message_data}")
+            logger.debug("Booking status connection received message (likely keepalive): %s", redact(message_data))
             # Return acknowledgment - booking status updates come from backend, not client messages
             send_to_client(connection_id, {"type": "ack", "message": "Received"})
             return {
@@ -483,7 +1325,8 @@ def handle_message(event, connection_id):
                     'connection_id': connection_id,
                     'message': message_data,
                     'token': token
-                }
+                },
+                '/api/chat/ws/{}/message'
             )
         elif connection_type == 'notification':
             # Forward to notification endpoint
@@ -493,7 +1336,8 @@ def handle_message(event, connection_id):
                     'connection_id': connection_id,
                     'message': message_data,
                     'token': token
-                }
+                },
+                '/api/notifications/ws/message'
             )
         elif connection_type == 'feed':
             # Forward to feed endpoint
@@ -502,13 +1346,14 @@ def handle_message(event, connection_id):
                 {
                     'connection_id': connection_id,
                     'message': message_data
-                }
+                },
+                '/api/ws/items-feed/message'
             )
         
         # Handle response from backend
         if not backend_response or not backend_response.get('success'):
             error_msg = backend_response.get('error', 'Unknown error') if backend_response else 'No response from backend'
-            logger.error(f"Backend request failed: {error_msg}")
+            logger.error("Backend request failed: %s", error_msg)
             return {
                 'statusCode': 502,
                 'body': json.dumps({'error': f'Backend request failed: {error_msg}'})
@@ -516,101 +1361,65 @@ def handle_message(event, connection_id):
         
         if backend_response.get('response'):
             response_data = backend_response['response']
-            logger.info(f"Backend response received: type={response_data.get('type')}, broadcast={response_data.get('broadcast')}")
+            logger.debug("Backend response received: type=%s, broadcast=%s",
+                         response_data.get('type'), response_data.get('broadcast'))
+            # Optional recipient hint: {"user_ids": [...], "booking_ids": [...]}, and
+            # participants_changed (drop the cached participants) - internal routing data,
+            # stripped before any delivery, broadcast or not
+            recipients = response_data.pop('recipients', None)
+            participants_changed = bool(response_data.pop('participants_changed', False))
             
             # If backend indicates this should be broadcast
             if response_data.get('broadcast'):
                 # Extract booking_id from response payload (for single WebSocket per user routing)
                 response_booking_id = response_data.get('booking_id') or booking_id
+                # ⚡ RECIPIENT HINT: Backend already knows who should receive this message -
+                # resolve it from the registry alone (no /participants call). A malformed or
+                # empty hint falls back to the booking's participants rather than reaching nobody.
+                recipient_keys = get_recipient_keys(recipients) if recipients is not None else []
+                if recipients is not None and not recipient_keys:
+                    logger.warning("Recipient hint named no recipients, falling back to booking %s", response_booking_id)
                 
-                if connection_type == 'chat' and response_booking_id:
-                    # Broadcast to all connections for this booking_id
-                    # For single WebSocket per user, also broadcast to user connections
-                    all_connection_ids = get_connection_ids_for_booking(response_booking_id, connection_type='chat')
-                    
-                    # ⚡ SINGLE WEBSOCKET PER USER: Also get user connections
-                    # Get owner_id and renter_id from backend to find user connections
-                    try:
-                        # Call backend to get booking participants
-                        booking_info_response = forward_to_backend(
-                            f"{BACKEND_URL}/api/chat/ws/{response_booking_id}/participants",
-                            {'token': token} if token else {}
+                if connection_type == 'chat' and (recipient_keys or response_booking_id):
+                    if recipient_keys:
+                        logger.debug("Using recipient hint for booking %s: %s", response_booking_id, recipient_keys)
+                    else:
+                        # Broadcast to all connections for this booking_id
+                        # ⚡ SINGLE WEBSOCKET PER USER: plus the owner's and renter's user connections
+                        # (participants are cached per booking; backend sets participants_changed
+                        # when they change)
+                        recipient_keys = iter_booking_recipient_keys(
+                            response_booking_id,
+                            token,
+                            participants_changed=participants_changed
                         )
-                        if booking_info_response and booking_info_response.get('success') and booking_info_response.get('response'):
-                            participants = booking_info_response['response']
-                            owner_id = participants.get('owner_id')
-                            renter_id = participants.get('renter_id')
-                            
-                            # Get connections for owner and renter (single WebSocket per user)
-                            if owner_id:
-                                owner_connections = get_connection_ids_for_booking(f"user_{owner_id}", connection_type='chat')
-                                all_connection_ids.extend(owner_connections)
-                                logger.info(f"Found {len(owner_connections)} owner connections for user_{owner_id}")
-                            if renter_id:
-                                renter_connections = get_connection_ids_for_booking(f"user_{renter_id}", connection_type='chat')
-                                all_connection_ids.extend(renter_connections)
-                                logger.info(f"Found {len(renter_connections)} renter connections for user_{renter_id}")
-                    except Exception as e:
-                        logger.warning(f"Failed to get booking participants for broadcast: {e}")
-                        # Continue with just booking_id connections
-                    
-                    # Remove duplicates
-                    all_connection_ids = list(set(all_connection_ids))
-                    logger.info(f"Broadcasting to {len(all_connection_ids)} total connections for booking {response_booking_id}: {all_connection_ids}")
-                    
-                    # ⚡ BATCH BROADCAST: Send in chunks of 25 (API Gateway limit) with parallel execution
-                    # This improves performance when broadcasting to many connections
-                    def send_to_connection(conn_id):
-                        try:
-                            send_to_client(conn_id, response_data)
-                            return {'success': True, 'connection_id': conn_id}
-                        except ClientError as e:
-                            error_code = e.response.get('Error', {}).get('Code', '')
-                            if error_code == 'GoneException':
-                                logger.warning(f"Connection {conn_id} is gone - will be cleaned up on $disconnect")
-                            else:
-                                logger.error(f"Failed to send to connection {conn_id}: {e}")
-                            return {'success': False, 'connection_id': conn_id, 'error': str(e)}
-                        except Exception as e:
-                            if 'GoneException' in str(type(e)) or 'Gone' in str(e):
-                                logger.warning(f"Connection {conn_id} is gone - will be cleaned up on $disconnect")
-                            else:
-                                logger.error(f"Failed to send to connection {conn_id}: {e}")
-                            return {'success': False, 'connection_id': conn_id, 'error': str(e)}
                     
-                    # Batch connections into chunks of 25
-                    chunk_size = 25
-                    broadcast_count = 0
-                    for i in range(0, len(all_connection_ids), chunk_size):
-                        chunk = all_connection_ids[i:i + chunk_size]
-                        logger.info(f"Broadcasting to chunk {i//chunk_size + 1}: {len(chunk)} connections")
-                        
-                        # Use ThreadPoolExecutor for parallel sends within each chunk
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                            futures = [executor.submit(send_to_connection, conn_id) for conn_id in chunk]
-                            for future in concurrent.futures.as_completed(futures):
-                                result = future.result()
-                                if result.get('success'):
-                                    broadcast_count += 1
+                    # ⚡ STREAMED BROADCAST: recipients are read page by page and sent to as they
+                    # arrive, on the container's long-lived fan-out executor.
+                    # connection_keys maps each (deduplicated) connection_id to its registry partition key
+                    connection_keys = {}
+                    results = fanout_engine.broadcast(
+                        iter_connections_for_keys(recipient_keys, 'chat', connection_keys),
+                        response_data
+                    )
+                    # $disconnect may never arrive for these - reap them now in one batch
+                    remove_connections_batch([(connection_keys[conn_id], conn_id) for conn_id in results['gone']])
                     
-                    logger.info(f"Broadcast complete: sent to {broadcast_count}/{len(all_connection_ids)} connections")
+                    logger.info("Broadcast complete: sent to %d/%d connections for booking %s",
+                                results['delivered'], len(connection_keys), response_booking_id)
                 elif connection_type == 'notification' and response_data.get('user_id'):
-                    # Broadcast to all connections for this user_id
+                    # Broadcast to all connections for this user_id (users with many tabs/devices)
                     user_id = response_data['user_id']
-                    all_connection_ids = get_connection_ids_for_user(str(user_id), connection_type='notification')
-                    logger.info(f"Broadcasting to {len(all_connection_ids)} notification connections for user {user_id}")
-                    
-                    broadcast_count = 0
-                    for conn_id in all_connection_ids:
-                        try:
-                            send_to_client(conn_id, response_data)
-                            broadcast_count += 1
-                        except Exception as e:
-                            logger.error(f"Failed to send to connection {conn_id}: {e}")
-                            # Connection might be dead, remove it
-                            remove_connection(conn_id, f"user_{user_id}")
+                    connection_keys = {}
+                    results = fanout_engine.broadcast(
+                        iter_connections_for_keys([f"user_{user_id}"], 'notification', connection_keys),
+                        response_data
+                    )
+                    # Connections are dead, remove them in one batch
+                    remove_connections_batch([(connection_keys[conn_id], conn_id) for conn_id in results['gone']])
                     
-                    logger.info(f"Broadcast complete: sent to {broadcast_count}/{len(all_connection_ids)} notification connections")
+                    logger.info("Broadcast complete: sent to %d/%d notification connections for user %s",
+                                results['delivered'], len(connection_keys), user_id)
                 else:
                     # Send response back to sender only
                     send_to_client(connection_id, response_data)
@@ -631,74 +1440,239 @@ def handle_message(event, connection_id):
         }
 
 
-def forward_to_backend(url, data):
+def forward_to_backend(url, data, route: str):
     """
     Forward message to backend HTTP endpoint.
-    Uses urllib instead of requests (which isn't available in Lambda by default).
+    Uses the container-wide keep-alive pool (http.client, since requests isn't available
+    in Lambda by default) so consecutive calls reuse the same TCP/TLS connection.
+    
+    Args:
+        url: Backend URL
+        data: JSON-serializable request body
+        route: Path template of the endpoint with IDs as {} (e.g. '/api/ws/bookings/{}/connect');
+            keys its latency history, so endpoints sharing a last path segment get separate timeouts
     """
+    http_client = lazy_import('http.client')
+    # Coarse endpoint name (connect / message / participants) for stage metrics and log fields
+    endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+    
+    # ⚡ ADAPTIVE TIMEOUT: p99-based per route, and never past the point where the
+    # invocation could no longer deliver the result (fan-out reserve before the deadline)
+    timeout, budget = backend_timeouts.budget(route, invocation_deadline, BACKEND_FANOUT_RESERVE_MS / 1000.0)
+    metrics.set_property(f"backend_{endpoint}_budget", budget)
+    metrics.count(f"backend_budget_{budget}")
+    if timeout is None:
+        logger.error("Backend call skipped: no time left before the invocation deadline, URL: %s", url)
+        return {'success': False, 'error': 'Invocation deadline reached before backend call'}
+    metrics.set_property(f"backend_{endpoint}_timeout_ms", round(timeout * 1000.0))
+    
+    # ⚡ CIRCUIT BREAKER: while the backend is down (e.g. the ECS task is restarting) fail in
+    # milliseconds instead of holding the invocation - and Lambda concurrency - for the timeout
+    parts = urllib.parse.urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    allowed, circuit = backend_breaker.allow(origin)
+    metrics.set_property('backend_circuit', circuit)
+    if not allowed:
+        metrics.count('backend_rejected')
+        logger.warning("Backend circuit %s, failing fast: %s", circuit, url)
+        return {'success': False, 'error': f"Backend circuit {circuit}"}
+    
+    # Network errors, timeouts and 5xx count against the breaker; 4xx are the caller's problem
+    healthy = False
+    started = time.monotonic()
     try:
         # Log request details (without exposing sensitive data)
-        log_data = {k: (v[:20] + '...' if isinstance(v, str) and len(v) > 30 and k == 'token' else v) for k, v in data.items()}
-        logger.info(f"Forwarding to backend: {url}, data_keys={list(data.keys())}")
-        
-        # Prepare the request
-        json_data = json.dumps(data).encode('utf-8')
-        req = urllib.request.Request(
-            url,
-            data=json_data,
-            headers={'Content-Type': 'application/json'},
-            method='POST'
-        )
+        logger.debug("Forwarding to backend: %s, data=%s, timeout=%.3fs (%s)", url, redact(data), timeout, budget)
         
-        # Make the request with timeout (reduced to 3 seconds to prevent connection timeout)
-        with urllib.request.urlopen(req, timeout=3) as response:
-            response_data = response.read().decode('utf-8')
-            status_code = response.getcode()
-            
-            if status_code >= 200 and status_code < 300:
-                try:
-                    parsed_response = json.loads(response_data) if response_data else {}
-                    logger.info(f"Backend response success: status={status_code}, response_keys={list(parsed_response.keys())}")
-                    return {'success': True, 'response': parsed_response}
-                except json.JSONDecodeError:
-                    logger.warning(f"Backend returned non-JSON response: {response_data[:200]}")
-                    return {'success': True, 'response': {}}
-            else:
-                logger.error(f"Backend request failed with status {status_code}: {response_data[:500]}")
-                return {'success': False, 'error': f"HTTP {status_code}"}
-                
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if hasattr(e, 'read') else str(e)
-        logger.error(f"Backend HTTP error: {e.code} - {error_body[:500]}")
-        # Log request URL and data keys for debugging
-        logger.error(f"Request URL: {url}, Data keys: {list(data.keys())}")
-        return {'success': False, 'error': f"HTTP {e.code}: {error_body}"}
-    except urllib.error.URLError as e:
-        logger.error(f"Backend URL error: {e}, URL: {url}")
+        # Timed per endpoint: backend_connect / backend_message / backend_participants
+        with metrics.stage(f"backend_{endpoint}"):
+            status_code, body = backend_pool.request(
+                'POST',
+                url,
+                body=json.dumps(data).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                timeout=timeout
+            )
+        backend_timeouts.observe(route, time.monotonic() - started)
+        healthy = status_code < 500
+        response_data = body.decode('utf-8')
+        
+        if status_code >= 200 and status_code < 300:
+            try:
+                parsed_response = json.loads(response_data) if response_data else {}
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Backend response success: status=%s, response=%s, pool=%s",
+                                 status_code, redact(parsed_response), backend_pool.stats())
+                return {'success': True, 'response': parsed_response}
+            except json.JSONDecodeError:
+                logger.warning("Backend returned non-JSON response: %s", redact(response_data))
+                return {'success': True, 'response': {}}
+        
+        logger.error("Backend HTTP error: %s - %s, URL: %s, data=%s", status_code, redact(response_data), url, redact(data))
+        # Status only: the body may echo tokens or message text, and this error is logged
+        # by the callers and returned to the client
+        return {'success': False, 'error': f"HTTP {status_code}"}
+    except TimeoutError as e:
+        # Censored sample: the call took at least this long
+        backend_timeouts.observe(route, timeout)
+        metrics.count('backend_timeouts')
+        logger.error("Backend timeout after %.3fs (%s budget): %s, URL: %s", timeout, budget, e, url)
+        return {'success': False, 'error': str(e) or 'timed out'}
+    except (OSError, http_client.HTTPException) as e:
+        logger.error("Backend URL error: %s, URL: %s", e, url)
         return {'success': False, 'error': str(e)}
     except Exception as e:
-        logger.error(f"Backend request failed: {e}, URL: {url}", exc_info=True)
+        logger.error("Backend request failed: %s, URL: %s", e, url, exc_info=True)
         return {'success': False, 'error': str(e)}
+    finally:
+        metrics.set_property('backend_circuit', backend_breaker.record(origin, healthy))
+
+
+def get_booking_participants(booking_id, token=None):
+    """
+    Get a booking's participants (owner_id, renter_id), cached per container.
+    
+    Args:
+        booking_id: Booking ID to look up
+        token: JWT token used to authorize the backend call on a cache miss
+    
+    Returns:
+        Dict with owner_id and renter_id, or None if the backend call failed
+    """
+    cache_key = str(booking_id)
+    participants = participants_cache.get(cache_key)
+    metrics.cache_lookup('participants', participants is not None)
+    if participants is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Participants cache hit for booking %s: %s", booking_id, participants_cache.stats())
+        return participants
+    
+    # Call backend to get booking participants
+    booking_info_response = forward_to_backend(
+        f"{BACKEND_URL}/api/chat/ws/{booking_id}/participants",
+        {'token': token} if token else {},
+        '/api/chat/ws/{}/participants'
+    )
+    if booking_info_response and booking_info_response.get('success') and booking_info_response.get('response'):
+        participants = booking_info_response['response']
+        participants_cache.put(cache_key, participants)
+        return participants
+    return None
+
+
+def get_apigw_management_client(endpoint_url: str):
+    """
+    Get (or create once per container) the API Gateway Management API client for an endpoint.
+    
+    Args:
+        endpoint_url: https://{domain}/{stage} of the WebSocket API
+    
+    Returns:
+        boto3 apigatewaymanagementapi client
+    """
+    client = apigw_clients.get(endpoint_url)
+    if client is None:
+        with lazy_init_lock:
+            client = apigw_clients.get(endpoint_url)
+            if client is None:
+                boto3 = lazy_import('boto3')
+                botocore_config = lazy_import('botocore.config')
+                with init_timer('client apigatewaymanagementapi'):
+                    client = boto3.client(
+                        'apigatewaymanagementapi',
+                        endpoint_url=endpoint_url,
+                        region_name=AWS_REGION,
+                        config=botocore_config.Config(
+                            max_pool_connections=APIGW_MAX_POOL_CONNECTIONS,
+                            # Per-send deadline for fan-out - one slow socket can't hold a worker for long
+                            connect_timeout=FANOUT_SEND_TIMEOUT_SECONDS,
+                            read_timeout=FANOUT_SEND_TIMEOUT_SECONDS,
+                            retries={'max_attempts': 2, 'mode': 'standard'}
+                        )
+                    )
+                apigw_clients[endpoint_url] = client
+                logger.info(f"Initialized API Gateway Management API client with endpoint: {endpoint_url}, max_pool_connections={APIGW_MAX_POOL_CONNECTIONS}")
+    return client
+
+
+def get_management_client():
+    """
+    The Management API client for the current invocation's endpoint, created on first use.
+    
+    Returns:
+        boto3 apigatewaymanagementapi client, or None if no endpoint is known or creation failed
+    """
+    global apigw_management
+    if apigw_management is None and apigw_endpoint_url:
+        try:
+            apigw_management = get_apigw_management_client(apigw_endpoint_url)
+        except Exception as e:
+            logger.error(f"Failed to initialize API Gateway Management API client: {e}")
+    return apigw_management
+
+
+def encode_payload(data):
+    """
+    Serialize a payload for post_to_connection, enforcing API Gateway's 128 KB limit.
+    
+    Oversize payloads are replaced by a small reference the client can act on
+    (fetch the full data over HTTP) instead of failing once per recipient.
+    
+    Args:
+        data: JSON-serializable payload
+    
+    Returns:
+        UTF-8 encoded JSON bytes (at most MAX_PAYLOAD_BYTES)
+    """
+    payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if len(payload) <= MAX_PAYLOAD_BYTES:
+        return payload
+    
+    logger.warning(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD_BYTES} byte limit, sending reference instead")
+    return json.dumps(oversize_reference(data, len(payload)), separators=(',', ':')).encode('utf-8')
+
+
+def oversize_reference(data, size: int):
+    """
+    Build the stand-in for a payload too large to send over the WebSocket.
+    
+    Keeps routing fields (type, booking_id, message id) and, for chat, the HTTP
+    endpoint the frontend already uses to load history.
+    """
+    reference = {'type': data.get('type') if isinstance(data, dict) else None, 'truncated': True, 'size': size}
+    if isinstance(data, dict):
+        booking_id = data.get('booking_id')
+        if booking_id:
+            reference['booking_id'] = booking_id
+            reference['fetch'] = f"/api/chat/bookings/{booking_id}"
+        message = data.get('message')
+        if isinstance(message, dict) and message.get('id') is not None:
+            reference['message_id'] = message['id']
+        if data.get('ref'):
+            # Backend-provided link for the full payload takes precedence
+            reference['fetch'] = data['ref']
+    return reference
 
 
+@timed_stage('send')
 def send_to_client(connection_id, data):
     """
     Send message to client via API Gateway Management API.
     """
-    global apigw_management
+    client = get_management_client()
     
-    if apigw_management is None:
+    if client is None:
         logger.error("API Gateway Management API client not initialized, cannot send message")
         return
     
     try:
-        apigw_management.post_to_connection(
+        client.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps(data).encode('utf-8')
+            Data=encode_payload(data)
         )
-        logger.info(f"Sent message to connection {connection_id}")
-    except apigw_management.exceptions.GoneException:
-        logger.warning(f"Connection {connection_id} is gone - will be cleaned up on $disconnect")
+        logger.debug("Sent message to connection %s", connection_id)
+    except client.exceptions.GoneException:
+        logger.warning("Connection %s is gone - will be cleaned up on $disconnect", connection_id)
         # Don't remove immediately - let $disconnect handle cleanup to avoid race conditions
         # Messages might still be in flight when connection closes
         raise  # Re-raise so caller knows the send failed
@@ -711,31 +1685,535 @@ def broadcast_message(connection_ids, data):
     """
     Broadcast message to multiple connections.
     Can be called from your backend via boto3 if needed.
+    
+    Returns:
+        FanoutEngine.broadcast() results (delivered/gone/throttled/failed/expired)
     """
-    for connection_id in connection_ids:
-        try:
-            send_to_client(connection_id, data)
-        except Exception as e:
-            logger.error(f"Failed to broadcast to {connection_id}: {e}")
+    return fanout_engine.broadcast(connection_ids, data)
 
 
-# DynamoDB connection tracking functions
+# Connection registry backends
+
+class ConnectionStore(abc.ABC):
+    """
+    Connection registry: one row per (booking_id, connection_id).
+    
+    Rows are dicts with booking_id, connection_id, connection_type, type_key,
+    created_at, ttl and optionally user_id and token (see store_connection()).
+    DynamoDBConnectionStore is the production backend; MemoryConnectionStore and
+    SQLiteConnectionStore have the same semantics (including TTL expiry) so the
+    handler can be run and profiled locally without AWS (CONNECTION_STORE=memory|sqlite).
+    
+    A backend missing one of the abstract methods fails when it is constructed
+    (create_connection_store()), not at the first request that reaches the method.
+    """
+    
+    @abc.abstractmethod
+    def put(self, item: dict):
+        """Insert or replace a row."""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def delete(self, booking_id: str, connection_id: str):
+        """Delete one row (no-op if it doesn't exist)."""
+        raise NotImplementedError
+    
+    def delete_many(self, keys):
+        """Delete rows given as (booking_id, connection_id) tuples."""
+        for booking_id, connection_id in keys:
+            self.delete(booking_id, connection_id)
+    
+    @abc.abstractmethod
+    def iter_connection_ids(self, partition_key: str, connection_type: str):
+        """Lazily yield the connection IDs of one type under a booking_id partition, each once."""
+        raise NotImplementedError
+    
+    def iter_connection_id_pages(self, partition_key: str, connection_type: str):
+        """Like iter_connection_ids(), but yield lists of up to RECIPIENT_QUERY_PAGE_SIZE IDs."""
+        page = []
+        for conn_id in self.iter_connection_ids(partition_key, connection_type):
+            page.append(conn_id)
+            if len(page) >= RECIPIENT_QUERY_PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+    
+    @abc.abstractmethod
+    def find_items(self, connection_id: str, first_only: bool = False):
+        """Return the rows for a connection_id (at most one if first_only)."""
+        raise NotImplementedError
+    
+    def available(self):
+        """False while the backend is known to be unusable (registry access is skipped)."""
+        return True
+
+
+class DynamoDBConnectionStore(ConnectionStore):
+    """
+    Registry on the DynamoDB table (hash key booking_id, range key connection_id).
+    
+    Recipient lookups use the type_key-index according to RECIPIENT_KEY_MODE;
+    connection_id lookups use the connection_id-index. Both fall back to the
+    base table while an index is missing or still backfilling.
+    
+    There is no up-front describe_table check: the first real read or write is
+    the probe. If it fails because the table is missing, available() returns
+    False for CONNECTIONS_TABLE_RETRY_SECONDS (doubling on each further failure,
+    up to CONNECTIONS_TABLE_RETRY_MAX_SECONDS); the next call after that window
+    is the new probe. AccessDeniedException is not backed off: IAM grants are per
+    action, so one missing grant (say BatchWriteItem) must not stop the calls
+    that are permitted - it is raised to that caller only.
+    
+    Recipient queries run concurrently on the registry lookup pool, so they go
+    through a low-level DynamoDB client: boto3 clients are thread-safe, resources
+    are not. (Not table.meta.client - the resource registers its own parameter
+    and response transforms on that client.) Everything else uses the Table
+    resource on the handler thread.
+    
+    Args:
+        table: boto3 DynamoDB Table resource
+        client: boto3 low-level DynamoDB client (default: get_dynamodb_client(), created on first use)
+    """
+    
+    # Errors that mean the table itself is unusable (not a single bad request, a denied action or throttling)
+    TABLE_UNAVAILABLE_ERRORS = ('ResourceNotFoundException',)
+    
+    def __init__(self, table, client=None):
+        self.table = table
+        self.client = client
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+    
+    def available(self):
+        return time.monotonic() >= self.retry_at
+    
+    def _record_error(self, error: ClientError, on_index: bool = False):
+        """Start (or extend) the backoff if the error shows the table is unusable."""
+        error_code = error.response.get('Error', {}).get('Code', '')
+        # A missing index is handled by the callers' fallbacks, not a table outage
+        if error_code not in self.TABLE_UNAVAILABLE_ERRORS or on_index:
+            return
+        with self._lock:
+            self.failures += 1
+            delay = min(CONNECTIONS_TABLE_RETRY_SECONDS * (2 ** (self.failures - 1)), CONNECTIONS_TABLE_RETRY_MAX_SECONDS)
+            self.retry_at = time.monotonic() + delay
+        logger.warning(f"DynamoDB table {CONNECTIONS_TABLE} not accessible ({error_code}), "
+                       f"skipping registry access for {delay:g}s (failure {self.failures})")
+    
+    def _record_success(self):
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+                self.retry_at = 0.0
+            logger.info(f"DynamoDB table {CONNECTIONS_TABLE} accessible again")
+    
+    def _call(self, operation: str, low_level: bool = False, **kwargs):
+        """
+        Run one data-plane call, tracking table availability.
+        
+        low_level calls go through the thread-safe client (typed AttributeValues in and out).
+        """
+        try:
+            if low_level:
+                if self.client is None:
+                    self.client = get_dynamodb_client()
+                response = getattr(self.client, operation)(TableName=self.table.name, **kwargs)
+            else:
+                response = getattr(self.table, operation)(**kwargs)
+        except ClientError as e:
+            self._record_error(e, on_index='IndexName' in kwargs)
+            raise
+        self._record_success()
+        return response
+    
+    def put(self, item: dict):
+        self._call('put_item', Item=item)
+    
+    def delete(self, booking_id: str, connection_id: str):
+        self._call(
+            'delete_item',
+            Key={
+                'booking_id': str(booking_id),
+                'connection_id': connection_id
+            }
+        )
+    
+    def delete_many(self, keys):
+        try:
+            # batch_writer sends BatchWriteItem requests of up to 25 deletes and retries unprocessed items
+            with self.table.batch_writer(overwrite_by_pkeys=['booking_id', 'connection_id']) as batch:
+                for booking_id, connection_id in keys:
+                    batch.delete_item(
+                        Key={
+                            'booking_id': str(booking_id),
+                            'connection_id': connection_id
+                        }
+                    )
+        except ClientError as e:
+            self._record_error(e)
+            raise
+        self._record_success()
+    
+    def query(self, **kwargs):
+        return self._call('query', **kwargs)
+    
+    def client_query(self, **kwargs):
+        """Query through the low-level client - safe to call from several threads at once."""
+        return self._call('query', low_level=True, **kwargs)
+    
+    def iter_connection_ids(self, partition_key: str, connection_type: str):
+        for page in self.iter_connection_id_pages(partition_key, connection_type):
+            yield from page
+    
+    def iter_connection_id_pages(self, partition_key: str, connection_type: str):
+        """
+        One list per Query page.
+        
+        In 'typed' mode the type_key-index is queried with begins_with(type_key, "<type>#"),
+        so only rows of the requested type are read. 'legacy' mode (and 'typed' while the
+        index is unavailable) runs the original base-table query with a FilterExpression,
+        which also finds rows written before type_key existed. The two are never combined:
+        the legacy query alone already returns every row the index would.
+        Both paths project connection_id only (never the stored token).
+        """
+        use_legacy = RECIPIENT_KEY_MODE != 'typed'
+        
+        if not use_legacy:
+            try:
+                for items in query_pages(
+                    self.client_query,
+                    IndexName=TYPE_KEY_INDEX,
+                    KeyConditionExpression='booking_id = :booking_id AND begins_with(type_key, :type_prefix)',
+                    ProjectionExpression='connection_id',
+                    ExpressionAttributeValues={
+                        ':booking_id': {'S': str(partition_key)},
+                        ':type_prefix': {'S': connection_type_key(connection_type, '')}
+                    },
+                    Limit=RECIPIENT_QUERY_PAGE_SIZE
+                ):
+                    yield [item['connection_id']['S'] for item in items]
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('ValidationException', 'ResourceNotFoundException'):
+                    raise
+                # Index missing or still backfilling - the legacy query covers every row
+                # (a failure can only come before the first page, so nothing was yielded yet)
+                logger.warning(f"Index {TYPE_KEY_INDEX} unavailable ({e}), using filtered query")
+                use_legacy = True
+        
+        if use_legacy:
+            for items in query_pages(
+                self.client_query,
+                KeyConditionExpression='booking_id = :booking_id',
+                FilterExpression='connection_type = :conn_type',
+                ProjectionExpression='connection_id',
+                ExpressionAttributeValues={
+                    ':booking_id': {'S': str(partition_key)},
+                    ':conn_type': {'S': connection_type}
+                },
+                Limit=RECIPIENT_QUERY_PAGE_SIZE
+            ):
+                yield [item['connection_id']['S'] for item in items]
+    
+    def find_items(self, connection_id: str, first_only: bool = False):
+        """
+        Uses a single Query against the connection_id GSI. While the index is missing
+        or still backfilling (right after it is added to an existing table), DynamoDB
+        rejects index reads with a ValidationException / ResourceNotFoundException, so
+        we fall back to the legacy paginated scan until the index becomes ACTIVE.
+        """
+        try:
+            query_kwargs = {
+                'IndexName': CONNECTION_ID_INDEX,
+                'KeyConditionExpression': 'connection_id = :conn_id',
+                'ExpressionAttributeValues': {
+                    ':conn_id': connection_id
+                }
+            }
+            if first_only:
+                query_kwargs['Limit'] = 1
+            response = self.query(**query_kwargs)
+            return response.get('Items', [])
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code', '')
+            if error_code not in ('ValidationException', 'ResourceNotFoundException'):
+                raise
+            logger.warning(f"Index {CONNECTION_ID_INDEX} not readable yet ({error_code}), falling back to scan for {connection_id}")
+        
+        # Legacy path: scan for the connection_id (it's the range key, so only a scan can find it)
+        # Handle pagination to ensure we find the connection even if it's not on the first page
+        items = []
+        last_evaluated_key = None
+        
+        while True:
+            scan_kwargs = {
+                'FilterExpression': 'connection_id = :conn_id',
+                'ExpressionAttributeValues': {
+                    ':conn_id': connection_id
+                }
+            }
+            
+            if last_evaluated_key:
+                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+            
+            response = self._call('scan', **scan_kwargs)
+            items.extend(response.get('Items', []))
+            
+            # If we only need one row and found it, stop paging
+            if first_only and items:
+                break
+            
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+        
+        return items
+
+
+class MemoryConnectionStore(ConnectionStore):
+    """
+    In-process registry with the DynamoDB backend's semantics.
+    
+    Rows whose ttl has passed are invisible to reads and dropped when next touched
+    (DynamoDB deletes them in the background; queries here never see them).
+    
+    Args:
+        clock: Returns the current Unix time (override to test TTL expiry)
+    """
+    
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._partitions = {}  # booking_id -> {connection_id: row}
+        self._by_connection = {}  # connection_id -> {booking_id}
+        self._lock = threading.Lock()
+    
+    def _discard(self, booking_id, connection_id):
+        partition = self._partitions.get(booking_id)
+        if partition is not None:
+            partition.pop(connection_id, None)
+            if not partition:
+                del self._partitions[booking_id]
+        booking_ids = self._by_connection.get(connection_id)
+        if booking_ids is not None:
+            booking_ids.discard(booking_id)
+            if not booking_ids:
+                del self._by_connection[connection_id]
+    
+    def _expired(self, item, now):
+        return item.get('ttl') is not None and int(item['ttl']) <= now
+    
+    def put(self, item: dict):
+        booking_id, connection_id = str(item['booking_id']), item['connection_id']
+        with self._lock:
+            self._partitions.setdefault(booking_id, {})[connection_id] = dict(item)
+            self._by_connection.setdefault(connection_id, set()).add(booking_id)
+    
+    def delete(self, booking_id: str, connection_id: str):
+        with self._lock:
+            self._discard(str(booking_id), connection_id)
+    
+    def iter_connection_ids(self, partition_key: str, connection_type: str):
+        now = self.clock()
+        with self._lock:
+            partition = self._partitions.get(partition_key, {})
+            expired = [conn_id for conn_id, item in partition.items() if self._expired(item, now)]
+            for conn_id in expired:
+                self._discard(partition_key, conn_id)
+            connection_ids = sorted(
+                conn_id for conn_id, item in self._partitions.get(partition_key, {}).items()
+                if item.get('connection_type') == connection_type
+            )
+        yield from connection_ids
+    
+    def find_items(self, connection_id: str, first_only: bool = False):
+        now = self.clock()
+        items = []
+        with self._lock:
+            for booking_id in sorted(self._by_connection.get(connection_id, ())):
+                item = self._partitions[booking_id][connection_id]
+                if self._expired(item, now):
+                    self._discard(booking_id, connection_id)
+                    continue
+                items.append(dict(item))
+        return items[:1] if first_only else items
+
+
+class SQLiteConnectionStore(ConnectionStore):
+    """
+    Registry in a SQLite database with the DynamoDB backend's semantics.
+    
+    The primary key and indexes mirror the table and its GSIs: (booking_id,
+    connection_id), (booking_id, type_key) for recipient lookups - paged by
+    type_key like a Query - and connection_id. Expired rows are never returned
+    and are purged every PURGE_EVERY writes.
+    
+    Args:
+        path: Database file (default: in-memory database)
+        clock: Returns the current Unix time (override to test TTL expiry)
+    """
+    
+    COLUMNS = ('booking_id', 'connection_id', 'connection_type', 'type_key', 'created_at', 'ttl', 'user_id', 'token')
+    PURGE_EVERY = 1000
+    
+    def __init__(self, path: str = ':memory:', clock=time.time):
+        # Only used for local runs - kept off the Lambda import path
+        sqlite3 = lazy_import('sqlite3')
+        self.clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Registry lookups and fan-out run on worker threads; the lock serializes access
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS connections (
+                booking_id TEXT NOT NULL,
+                connection_id TEXT NOT NULL,
+                connection_type TEXT,
+                type_key TEXT,
+                created_at INTEGER,
+                ttl INTEGER,
+                user_id TEXT,
+                token TEXT,
+                PRIMARY KEY (booking_id, connection_id)
+            );
+            CREATE INDEX IF NOT EXISTS connections_type_key ON connections (booking_id, type_key);
+            CREATE INDEX IF NOT EXISTS connections_connection_id ON connections (connection_id);
+        """)
+    
+    def put(self, item: dict):
+        row = {column: item.get(column) for column in self.COLUMNS}
+        row['booking_id'] = str(row['booking_id'])
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO connections ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [row[column] for column in self.COLUMNS]
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._db.execute('DELETE FROM connections WHERE ttl IS NOT NULL AND ttl <= ?', (int(self.clock()),))
+    
+    def delete(self, booking_id: str, connection_id: str):
+        with self._lock:
+            self._db.execute('DELETE FROM connections WHERE booking_id = ? AND connection_id = ?',
+                             (str(booking_id), connection_id))
+    
+    def delete_many(self, keys):
+        with self._lock:
+            self._db.executemany('DELETE FROM connections WHERE booking_id = ? AND connection_id = ?',
+                                 [(str(booking_id), connection_id) for booking_id, connection_id in keys])
+    
+    def iter_connection_ids(self, partition_key: str, connection_type: str):
+        # type_key range equivalent to begins_with(type_key, "<type>#"): '$' sorts right after '#'
+        prefix = connection_type_key(connection_type, '')
+        last_type_key = prefix
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT connection_id, type_key FROM connections '
+                    'WHERE booking_id = ? AND type_key > ? AND type_key < ? AND (ttl IS NULL OR ttl > ?) '
+                    'ORDER BY type_key LIMIT ?',
+                    (partition_key, last_type_key, prefix[:-1] + '$', int(self.clock()), RECIPIENT_QUERY_PAGE_SIZE)
+                ).fetchall()
+            for row in rows:
+                yield row['connection_id']
+            if len(rows) < RECIPIENT_QUERY_PAGE_SIZE:
+                return
+            last_type_key = rows[-1]['type_key']
+    
+    def find_items(self, connection_id: str, first_only: bool = False):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT * FROM connections WHERE connection_id = ? AND (ttl IS NULL OR ttl > ?) '
+                'ORDER BY booking_id' + (' LIMIT 1' if first_only else ''),
+                (connection_id, int(self.clock()))
+            ).fetchall()
+        # Like DynamoDB, absent attributes are left out rather than returned as None
+        return [{key: row[key] for key in row.keys() if row[key] is not None} for row in rows]
+
+
+def get_connection_store():
+    """
+    Get or create the connection registry backend selected by CONNECTION_STORE.
+    
+    Returns:
+        ConnectionStore, or None while the backend is backing off after it was found unusable
+    """
+    global connection_store
+    if connection_store is None:
+        with lazy_init_lock:
+            if connection_store is None:
+                connection_store = create_connection_store()
+        if connection_store is None:
+            return None
+    if not connection_store.available():
+        return None
+    return connection_store
+
+
+def create_connection_store():
+    """Build the backend selected by CONNECTION_STORE (None if the DynamoDB table can't be referenced)."""
+    if CONNECTION_STORE == 'memory':
+        store = MemoryConnectionStore()
+    elif CONNECTION_STORE == 'sqlite':
+        store = SQLiteConnectionStore(CONNECTION_STORE_PATH)
+    else:
+        table = get_connections_table()
+        if not table:
+            return None
+        store = DynamoDBConnectionStore(table)
+    logger.info(f"Using {type(store).__name__} for connection tracking")
+    return store
+
+
+# Connection tracking functions
+
+def get_dynamodb_resource():
+    """Get (or create once per container) the DynamoDB resource."""
+    global dynamodb
+    if dynamodb is None:
+        with lazy_init_lock:
+            if dynamodb is None:
+                boto3 = lazy_import('boto3')
+                with init_timer('client dynamodb'):
+                    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+    return dynamodb
+
+
+def get_dynamodb_client():
+    """Get (or create once per container) the low-level DynamoDB client (thread-safe, unlike the resource)."""
+    global dynamodb_client
+    if dynamodb_client is None:
+        with lazy_init_lock:
+            if dynamodb_client is None:
+                boto3 = lazy_import('boto3')
+                with init_timer('client dynamodb (low-level)'):
+                    dynamodb_client = boto3.client('dynamodb', region_name=AWS_REGION)
+    return dynamodb_client
+
 
 def get_connections_table():
-    """Get or create DynamoDB table reference."""
+    """
+    Get or create DynamoDB table reference.
+    
+    ⚡ No describe_table check: it is a control-plane call (with a much lower rate
+    limit) on the first request of every cold container. Creating the Table resource
+    makes no network call; the first real read/write is the probe, and failures
+    back off in DynamoDBConnectionStore.
+    """
     global connections_table
     if connections_table is None:
         try:
-            connections_table = dynamodb.Table(CONNECTIONS_TABLE)
-            # Test access by describing the table
-            connections_table.meta.client.describe_table(TableName=CONNECTIONS_TABLE)
-            logger.info(f"Connected to DynamoDB table: {CONNECTIONS_TABLE}")
+            connections_table = get_dynamodb_resource().Table(CONNECTIONS_TABLE)
+            logger.info(f"Using DynamoDB table: {CONNECTIONS_TABLE}")
         except Exception as e:
             logger.warning(f"DynamoDB table {CONNECTIONS_TABLE} not accessible: {e}")
             return None
     return connections_table
 
 
+@timed_stage('registry_write')
 def store_connection(connection_id: str, booking_id: str, user_id: str = None, connection_type: str = 'chat', token: str = None):
     """
     Store WebSocket connection in DynamoDB.
@@ -747,19 +2225,20 @@ def store_connection(connection_id: str, booking_id: str, user_id: str = None, c
         connection_type: Type of connection (chat, booking, notification, feed)
         token: JWT token (optional, stored for message routing)
     """
-    table = get_connections_table()
-    if not table:
-        logger.warning("DynamoDB table not available, skipping connection storage")
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, skipping connection storage")
         return
     
     try:
-        import time
         ttl = int(time.time()) + (24 * 60 * 60)  # 24 hours from now
         
         item = {
             'booking_id': str(booking_id),
             'connection_id': connection_id,
             'connection_type': connection_type,
+            # Sort key of the type_key-index: lets recipient lookups select by type with begins_with
+            'type_key': connection_type_key(connection_type, connection_id),
             'created_at': int(time.time()),
             'ttl': ttl
         }
@@ -771,56 +2250,138 @@ def store_connection(connection_id: str, booking_id: str, user_id: str = None, c
         if token:
             item['token'] = token
         
-        table.put_item(Item=item)
-        logger.info(f"Stored connection: {connection_id} for booking {booking_id}, type {connection_type}")
+        store.put(item)
+        metadata_cache.put(connection_id, {
+            'booking_id': item['booking_id'],
+            'token': token,
+            'connection_type': connection_type,
+            'user_id': item.get('user_id')
+        })
+        logger.info("Stored connection: %s for booking %s, type %s", connection_id, booking_id, connection_type)
     except Exception as e:
-        logger.error(f"Failed to store connection in DynamoDB: {e}")
+        logger.error(f"Failed to store connection: {e}")
         raise
 
 
+@timed_stage('registry_delete')
 def remove_connection(connection_id: str, booking_id: str = None):
     """
     Remove WebSocket connection from DynamoDB.
     
     Args:
         connection_id: API Gateway connection ID to remove
-        booking_id: Booking ID (optional, if None will scan to find it)
+        booking_id: Booking ID (optional, if None it is looked up via the connection_id index)
     """
-    table = get_connections_table()
-    if not table:
-        logger.warning("DynamoDB table not available, skipping connection removal")
+    # Evict first so a stale entry can't outlive the row, even if DynamoDB is unavailable
+    metadata_cache.evict(connection_id)
+    
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, skipping connection removal")
         return
     
     try:
         if booking_id:
             # Direct delete if we know the booking_id
-            table.delete_item(
-                Key={
-                    'booking_id': str(booking_id),
-                    'connection_id': connection_id
-                }
-            )
-            logger.info(f"Removed connection: {connection_id} for booking {booking_id}")
+            store.delete(booking_id, connection_id)
+            logger.info("Removed connection: %s for booking %s", connection_id, booking_id)
         else:
-            # Scan to find the connection if booking_id is unknown
-            # This is less efficient but needed for disconnect events
-            response = table.scan(
-                FilterExpression='connection_id = :conn_id',
-                ExpressionAttributeValues={
-                    ':conn_id': connection_id
-                }
-            )
-            
-            for item in response.get('Items', []):
-                table.delete_item(
-                    Key={
-                        'booking_id': item['booking_id'],
-                        'connection_id': connection_id
-                    }
-                )
-                logger.info(f"Removed connection: {connection_id} for booking {item.get('booking_id')}")
+            # Look up the row(s) via the connection_id index if booking_id is unknown
+            # (disconnect events only carry the connection_id)
+            for item in find_connection_items(connection_id):
+                metrics.set_dimension('ConnectionType', item.get('connection_type'))
+                store.delete(item['booking_id'], connection_id)
+                logger.info("Removed connection: %s for booking %s", connection_id, item.get('booking_id'))
     except Exception as e:
-        logger.error(f"Failed to remove connection from DynamoDB: {e}")
+        logger.error(f"Failed to remove connection: {e}")
+
+
+@timed_stage('registry_cleanup')
+def remove_connections_batch(keys):
+    """
+    Remove many WebSocket connections at once (BatchWriteItem on DynamoDB).
+    
+    Used after a broadcast to reap connections that came back GoneException, using
+    the partition keys the recipient lookup already returned (no scans or lookups).
+    
+    Args:
+        keys: List of (booking_id, connection_id) tuples
+    """
+    if not keys:
+        return
+    
+    for _, connection_id in keys:
+        metadata_cache.evict(connection_id)
+    
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, skipping connection removal")
+        return
+    
+    try:
+        store.delete_many(keys)
+        logger.info("Removed %d gone connections", len(keys))
+    except Exception as e:
+        logger.error(f"Failed to batch remove connections: {e}")
+
+
+def connection_type_key(connection_type: str, connection_id: str):
+    """Build the type_key sort key ("<connection_type>#<connection_id>") for a connection row."""
+    return f"{connection_type}#{connection_id}"
+
+
+def query_pages(query, **query_kwargs):
+    """
+    Run a Query and yield its Items one page at a time, following LastEvaluatedKey.
+    
+    The next page is only requested when the caller asks for it.
+    
+    Args:
+        query: Callable running one Query (e.g. Table.query or DynamoDBConnectionStore.client_query)
+    """
+    while True:
+        response = query(**query_kwargs)
+        yield response.get('Items', [])
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return
+        query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def iter_connection_ids(partition_key: str, connection_type: str = 'chat'):
+    """
+    Lazily yield the connection IDs of one connection type stored under a booking_id partition.
+    
+    Pages are fetched on demand (RECIPIENT_QUERY_PAGE_SIZE rows each), so a caller
+    can start sending to the first page while later pages are still being read,
+    and large audiences are never truncated at the first 1 MB page. Only
+    connection IDs are read (never the stored token).
+    
+    Args:
+        partition_key: booking_id value (a booking ID or "user_{user_id}")
+        connection_type: Type of connection to select (default: 'chat')
+    
+    Yields:
+        Connection IDs (each at most once)
+    """
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, returning empty connection list")
+        return
+    
+    yield from store.iter_connection_ids(partition_key, connection_type)
+
+
+def iter_connection_id_pages(partition_key: str, connection_type: str = 'chat'):
+    """
+    Like iter_connection_ids(), but yield one list of connection IDs per registry page.
+    """
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, returning empty connection list")
+        return
+    
+    yield from store.iter_connection_id_pages(partition_key, connection_type)
 
 
 def get_connection_ids_for_booking(booking_id: str, connection_type: str = 'chat'):
@@ -834,24 +2395,9 @@ def get_connection_ids_for_booking(booking_id: str, connection_type: str = 'chat
     Returns:
         List of connection IDs
     """
-    table = get_connections_table()
-    if not table:
-        logger.warning("DynamoDB table not available, returning empty connection list")
-        return []
-    
     try:
-        # Query by booking_id (hash key) and filter by connection_type
-        response = table.query(
-            KeyConditionExpression='booking_id = :booking_id',
-            FilterExpression='connection_type = :conn_type',
-            ExpressionAttributeValues={
-                ':booking_id': str(booking_id),
-                ':conn_type': connection_type
-            }
-        )
-        
-        connection_ids = [item['connection_id'] for item in response.get('Items', [])]
-        logger.info(f"Found {len(connection_ids)} {connection_type} connections for booking {booking_id}: {connection_ids}")
+        connection_ids = list(iter_connection_ids(str(booking_id), connection_type))
+        logger.debug("Found %d %s connections for booking %s", len(connection_ids), connection_type, booking_id)
         return connection_ids
     except Exception as e:
         logger.error(f"Failed to query connections from DynamoDB: {e}", exc_info=True)
@@ -869,31 +2415,196 @@ def get_connection_ids_for_user(user_id: str, connection_type: str = 'notificati
     Returns:
         List of connection IDs
     """
-    table = get_connections_table()
-    if not table:
-        logger.warning("DynamoDB table not available, returning empty connection list")
-        return []
-    
     try:
         # Use special booking_id format: "user_{user_id}"
-        booking_id = f"user_{user_id}"
-        response = table.query(
-            KeyConditionExpression='booking_id = :booking_id',
-            FilterExpression='connection_type = :conn_type',
-            ExpressionAttributeValues={
-                ':booking_id': booking_id,
-                ':conn_type': connection_type
-            }
-        )
-        
-        connection_ids = [item['connection_id'] for item in response.get('Items', [])]
-        logger.info(f"Found {len(connection_ids)} connections for user {user_id}")
+        connection_ids = list(iter_connection_ids(f"user_{user_id}", connection_type))
+        logger.debug("Found %d connections for user %s", len(connection_ids), user_id)
         return connection_ids
     except Exception as e:
         logger.error(f"Failed to query connections from DynamoDB for user {user_id}: {e}")
         return []
 
 
+def get_recipient_keys(recipients: dict):
+    """
+    Registry partition keys named by a backend recipient hint.
+    
+    Args:
+        recipients: {"user_ids": [...], "booking_ids": [...]} from the backend /message response
+    
+    Returns:
+        List of booking IDs and "user_{user_id}" keys; empty if the hint is malformed
+        or names nobody (the caller then falls back to the booking's participants)
+    """
+    if not isinstance(recipients, dict):
+        logger.warning("Ignoring malformed recipients hint (expected object): %s", type(recipients).__name__)
+        return []
+    keys = []
+    for field, prefix in (('booking_ids', ''), ('user_ids', 'user_')):
+        ids = recipients.get(field)
+        if ids is None:
+            continue
+        if not isinstance(ids, list):
+            # A bare "17" would otherwise be iterated as "1", "7"
+            logger.warning("Ignoring malformed recipients hint: %s is %s, expected a list",
+                           field, type(ids).__name__)
+            return []
+        keys.extend(f"{prefix}{value}" for value in ids if value is not None and value != '')
+    return keys
+
+
+def iter_booking_recipient_keys(booking_id, token=None, participants_changed: bool = False):
+    """
+    Yield the registry partition keys a chat broadcast for a booking goes to.
+    
+    The booking's own partition comes first; the owner's and renter's
+    "user_{user_id}" partitions (single WebSocket per user) follow once the
+    participants are known. Used lazily, the participants lookup runs while
+    the booking's connections are already being sent to.
+    
+    Args:
+        booking_id: Booking ID of the message
+        token: JWT token used to authorize a participants lookup
+        participants_changed: Drop the cached participants first (set by the backend)
+    """
+    yield str(booking_id)
+    
+    try:
+        if participants_changed:
+            participants_cache.evict(str(booking_id))
+        participants = get_booking_participants(booking_id, token)
+    except Exception as e:
+        # Continue with just booking_id connections
+        logger.warning(f"Failed to get booking participants for broadcast: {e}")
+        return
+    
+    if participants:
+        for user_id in (participants.get('owner_id'), participants.get('renter_id')):
+            if user_id:
+                yield f"user_{user_id}"
+
+
+def get_registry_lookup_executor():
+    """Get (or create once per container) the thread pool used for concurrent registry queries."""
+    global registry_lookup_executor
+    with registry_lookup_lock:
+        if registry_lookup_executor is None:
+            registry_lookup_executor = lazy_import('concurrent.futures').ThreadPoolExecutor(
+                max_workers=max(1, REGISTRY_LOOKUP_WORKERS),
+                thread_name_prefix='registry'
+            )
+        return registry_lookup_executor
+
+
+def iter_connections_for_keys(keys, connection_type: str = 'chat', connection_keys: dict = None, deadline: float = None):
+    """
+    Stream connection IDs for several partition keys (booking IDs and/or "user_{user_id}").
+    
+    ⚡ Each partition is queried on the registry lookup pool, all of them at once, and
+    connection IDs are yielded as soon as any query's page arrives - a chat broadcast's
+    booking, owner and renter lookups take as long as the slowest one, not the sum.
+    The keys themselves are also consumed on the pool, so a lazy key source (e.g. a
+    participants lookup) doesn't hold up connections that are already known.
+    Each connection ID is yielded once; a key whose lookup fails is logged and skipped.
+    Waiting for pages stops at the deadline, so a stalled partition query can't hold
+    the broadcast past the invocation's time budget.
+    
+    Args:
+        keys: Partition keys to look up (may itself be a lazy iterator; duplicates are ignored)
+        connection_type: Type of connection to filter by (default: 'chat')
+        connection_keys: Dict filled with connection_id -> partition key it is stored
+            under (needed to delete gone connections); connections already in it are skipped
+        deadline: time.monotonic() value to stop waiting at (default: the invocation deadline)
+    
+    Yields:
+        Connection IDs
+    """
+    if connection_keys is None:
+        connection_keys = {}
+    if deadline is None:
+        deadline = invocation_deadline
+    executor = get_registry_lookup_executor()
+    # (key, [connection_id, ...]) per registry page, (key, None) when a key is done,
+    # (None, count) once all keys are submitted. One item per page, not per ID: the
+    # queue handoff would otherwise cost more than the overlap saves for large audiences.
+    arrivals = queue.Queue()
+    stopped = threading.Event()
+    
+    def read_key(key):
+        try:
+            for page in iter_connection_id_pages(key, connection_type):
+                if stopped.is_set():
+                    break
+                arrivals.put((key, page))
+        except Exception as e:
+            logger.error(f"Failed to query {connection_type} connections for {key}: {e}", exc_info=True)
+        finally:
+            arrivals.put((key, None))
+    
+    def submit_keys():
+        submitted = 0
+        try:
+            for key in dict.fromkeys(keys):
+                if stopped.is_set():
+                    break
+                executor.submit(read_key, key)
+                submitted += 1
+        except Exception as e:
+            logger.error(f"Failed to resolve {connection_type} recipient keys: {e}", exc_info=True)
+        finally:
+            arrivals.put((None, submitted))
+    
+    started = time.perf_counter()
+    executor.submit(submit_keys)
+    found = {}
+    keys_submitted = None
+    keys_done = 0
+    try:
+        while keys_submitted is None or keys_done < keys_submitted:
+            try:
+                key, value = arrivals.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                logger.warning("Recipient lookup deadline reached with %d/%s %s keys read, remaining recipients skipped",
+                               keys_done, keys_submitted if keys_submitted is not None else '?', connection_type)
+                return
+            if key is None:
+                keys_submitted = value
+            elif value is None:
+                keys_done += 1
+                logger.debug("Found %d %s connections for %s", found.get(key, 0), connection_type, key)
+            else:
+                for conn_id in value:
+                    if conn_id not in connection_keys:
+                        connection_keys[conn_id] = key
+                        found[key] = found.get(key, 0) + 1
+                        yield conn_id
+    finally:
+        # Consumer stopped early (e.g. broadcast deadline) - let in-flight queries wind down
+        stopped.set()
+        # Wall time until the last recipient was known (overlaps the fan-out it feeds)
+        metrics.add_stage('recipient_lookup', (time.perf_counter() - started) * 1000.0)
+
+
+def get_connections_for_keys(keys, connection_type: str = 'chat'):
+    """
+    Registry lookup for several partition keys (booking IDs and/or "user_{user_id}") at once.
+    
+    The partitions are queried concurrently (see iter_connections_for_keys()).
+    
+    Args:
+        keys: Partition keys to look up (duplicates are ignored)
+        connection_type: Type of connection to filter by (default: 'chat')
+    
+    Returns:
+        Dict of connection_id -> partition key it is stored under (merged and deduplicated)
+    """
+    connection_keys = {}
+    for _ in iter_connections_for_keys(keys, connection_type, connection_keys):
+        pass
+    return connection_keys
+
+
+@timed_stage('metadata')
 def get_connection_metadata(connection_id: str):
     """
     Get connection metadata (booking_id, token, connection_type) from DynamoDB.
@@ -904,40 +2615,20 @@ def get_connection_metadata(connection_id: str):
     Returns:
         Dict with booking_id, token, connection_type, user_id (if available), or None if not found
     """
-    table = get_connections_table()
-    if not table:
-        logger.warning("DynamoDB table not available, cannot retrieve connection metadata")
+    metadata = metadata_cache.get(connection_id)
+    metrics.cache_lookup('metadata', metadata is not None)
+    if metadata is not None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Connection metadata cache hit for %s: %s", connection_id, metadata_cache.stats())
+        return metadata
+    
+    store = get_connection_store()
+    if not store:
+        logger.warning("Connection store not available, cannot retrieve connection metadata")
         return None
     
     try:
-        # Scan for the connection_id (since it's the range key, we need to scan)
-        # Handle pagination to ensure we find the connection even if it's not on the first page
-        items = []
-        last_evaluated_key = None
-        
-        while True:
-            scan_kwargs = {
-                'FilterExpression': 'connection_id = :conn_id',
-                'ExpressionAttributeValues': {
-                    ':conn_id': connection_id
-                }
-            }
-            
-            if last_evaluated_key:
-                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
-            
-            response = table.scan(**scan_kwargs)
-            items.extend(response.get('Items', []))
-            
-            # Check if there are more pages
-            last_evaluated_key = response.get('LastEvaluatedKey')
-            
-            # If we found the item, break
-            if items:
-                break
-            
-            if not last_evaluated_key:
-                break
+        items = find_connection_items(connection_id, first_only=True)
         
         if items:
             item = items[0]
@@ -947,13 +2638,38 @@ def get_connection_metadata(connection_id: str):
                 'connection_type': item.get('connection_type', 'booking'),
                 'user_id': item.get('user_id')
             }
-            logger.info(f"Retrieved connection metadata for {connection_id}: type={metadata['connection_type']}, booking_id={metadata['booking_id']}")
+            metadata_cache.put(connection_id, metadata)
+            logger.debug("Retrieved connection metadata for %s: type=%s, booking_id=%s",
+                         connection_id, metadata['connection_type'], metadata['booking_id'])
             return metadata
         
         logger.warning(f"Connection metadata not found for {connection_id}")
         return None
     except Exception as e:
-        logger.error(f"Failed to retrieve connection metadata from DynamoDB: {e}", exc_info=True)
+        logger.error(f"Failed to retrieve connection metadata: {e}", exc_info=True)
         return None
 
 
+def find_connection_items(connection_id: str, first_only: bool = False):
+    """
+    Find the registry rows for a connection_id.
+    
+    On DynamoDB this is a single Query against the connection_id GSI (a scan while
+    the index is still backfilling).
+    
+    Args:
+        connection_id: Connection ID to look up
+        first_only: Stop after the first matching row (metadata lookups)
+    
+    Returns:
+        List of items (booking_id, connection_id, connection_type, token, user_id)
+    """
+    store = get_connection_store()
+    if not store:
+        return []
+    
+    return store.find_items(connection_id, first_only=first_only)
+
+
+# Total time to import this module (the Lambda init phase), reported by emit_init_report()
+init_timings['module'] = round((time.perf_counter() - INIT_STARTED) * 1000.0, 2)
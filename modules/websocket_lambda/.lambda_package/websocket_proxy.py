@@ -10,6 +10,7 @@ import os
 import boto3
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -18,6 +19,11 @@ logger.setLevel(logging.INFO)
 BACKEND_URL = os.environ.get('BACKEND_URL', 'http://44.206.238.155:8000')
 CONNECTIONS_TABLE = os.environ.get('CONNECTIONS_TABLE', 'websocket-connections')
 
+# Backend call timeout; cut short when less is left of the invocation than the call plus
+# BACKEND_FANOUT_RESERVE_MS (kept back for sending the result to clients)
+BACKEND_TIMEOUT_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_SECONDS', '5'))
+BACKEND_FANOUT_RESERVE_MS = int(os.environ.get('BACKEND_FANOUT_RESERVE_MS', '1000'))
+
 # Get AWS region from boto3 session (AWS_REGION is reserved and auto-set by Lambda)
 try:
     AWS_REGION = boto3.Session().region_name or 'us-east-1'
@@ -28,6 +34,16 @@ except Exception:
 # Will be initialized with endpoint URL when API Gateway endpoint is available
 apigw_management = None
 
+# Lambda context of the current invocation (remaining time bounds backend calls)
+lambda_context = None
+
+# Backend HTTP session - lives for the container's lifetime so keep-alive connections
+# (and TLS sessions) to the backend are reused instead of reopened on every call
+BACKEND_POOL_MAXSIZE = int(os.environ.get('BACKEND_POOL_MAXSIZE', '10'))
+backend_session = requests.Session()
+backend_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_MAXSIZE))
+backend_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_MAXSIZE))
+
 # DynamoDB client for connection tracking
 dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
 connections_table = None
@@ -47,6 +63,9 @@ def lambda_handler(event, context):
     domain_name = event.get('requestContext', {}).get('domainName')
     stage = event.get('requestContext', {}).get('stage')
     
+    global lambda_context
+    lambda_context = context
+    
     # Initialize API Gateway Management API client
     global apigw_management
     
@@ -354,16 +373,37 @@ def handle_message(event, connection_id):
         }
 
 
+def backend_timeout():
+    """
+    Timeout for the next backend call: BACKEND_TIMEOUT_SECONDS, or less if the invocation
+    would otherwise run out of time before the result could be sent.
+    
+    Returns:
+        Seconds, or None if no time is left for the call
+    """
+    if lambda_context is None or not hasattr(lambda_context, 'get_remaining_time_in_millis'):
+        return BACKEND_TIMEOUT_SECONDS
+    remaining = (lambda_context.get_remaining_time_in_millis() - BACKEND_FANOUT_RESERVE_MS) / 1000.0
+    if remaining <= 0:
+        return None
+    return min(BACKEND_TIMEOUT_SECONDS, remaining)
+
+
 def forward_to_backend(url, data):
     """
     Forward message to backend HTTP endpoint.
     """
+    timeout = backend_timeout()
+    if timeout is None:
+        logger.error(f"Backend call skipped: no time left before the invocation deadline, URL: {url}")
+        return {'success': False, 'error': 'Invocation deadline reached before backend call'}
+    
     try:
-        response = requests.post(
+        response = backend_session.post(
             url,
             json=data,
             headers={'Content-Type': 'application/json'},
-            timeout=5
+            timeout=timeout
         )
         response.raise_for_status()
         return {'success': True, 'response': response.json() if response.content else {}}
@@ -414,10 +454,10 @@ def get_connections_table():
     global connections_table
     if connections_table is None:
         try:
+            # No describe_table probe (a control-plane call on every cold start) - the
+            # first real read/write surfaces access errors, which callers already log
             connections_table = dynamodb.Table(CONNECTIONS_TABLE)
-            # Test access by describing the table
-            connections_table.meta.client.describe_table(TableName=CONNECTIONS_TABLE)
-            logger.info(f"Connected to DynamoDB table: {CONNECTIONS_TABLE}")
+            logger.info(f"Using DynamoDB table: {CONNECTIONS_TABLE}")
         except Exception as e:
             logger.warning(f"DynamoDB table {CONNECTIONS_TABLE} not accessible: {e}")
             return None
@@ -128,6 +128,32 @@ resource "aws_dynamodb_table" "websocket_connections" {
     type = "S"
   }
 
+  attribute {
+    name = "type_key"
+    type = "S"
+  }
+
+  # Reverse lookup by connection_id for $default / $disconnect (avoids full-table scans).
+  # Adding this to an existing table makes DynamoDB backfill existing rows automatically;
+  # until the index is ACTIVE the Lambda falls back to the legacy scan.
+  global_secondary_index {
+    name               = var.connection_id_index_name
+    hash_key           = "connection_id"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["connection_type", "token", "user_id"]
+  }
+
+  # Recipient lookup by booking_id + connection type: type_key is "<connection_type>#<connection_id>",
+  # so a Query with begins_with(type_key, "chat#") reads only chat rows. KEYS_ONLY keeps
+  # tokens out of the index. Sparse - rows written before type_key existed are not indexed,
+  # which is why the Lambda keeps the legacy query until var.recipient_key_mode is switched to "typed".
+  global_secondary_index {
+    name            = var.type_key_index_name
+    hash_key        = "booking_id"
+    range_key       = "type_key"
+    projection_type = "KEYS_ONLY"
+  }
+
   ttl {
     enabled        = true
     attribute_name = "ttl"
@@ -201,7 +227,7 @@ resource "aws_iam_role_policy" "lambda_dynamodb" {
         Effect = "Allow"
         Action = [
         "dynamodb:PutItem", "dynamodb:GetItem", "dynamodb:Query",
-        "dynamodb:DeleteItem", "dynamodb:Scan", "dynamodb:DescribeTable"
+        "dynamodb:DeleteItem", "dynamodb:BatchWriteItem", "dynamodb:Scan", "dynamodb:DescribeTable"
       ]
       Resource = [local.effective_table_arn, "${local.effective_table_arn}/index/*"]
     }]
@@ -239,8 +265,11 @@ resource "aws_iam_role_policy_attachment" "lambda_basic" {
 # ============================================================================
 
 data "archive_file" "lambda_zip" {
-  type        = "zip"
-  source_file = var.lambda_source_file
+  type = "zip"
+  # A bundle directory from lambda/tools/build_bundle.py (handler + import closure + bytecode)
+  # takes precedence over the single handler file
+  source_file = var.lambda_source_dir == null ? var.lambda_source_file : null
+  source_dir  = var.lambda_source_dir
   output_path = "${path.module}/lambda_function.zip"
 }
 
@@ -261,6 +290,9 @@ resource "aws_lambda_function" "websocket_proxy" {
     variables = merge({
       BACKEND_URL          = var.backend_url
       CONNECTIONS_TABLE    = local.effective_table_name
+      CONNECTION_ID_INDEX  = var.connection_id_index_name
+      TYPE_KEY_INDEX       = var.type_key_index_name
+      RECIPIENT_KEY_MODE   = var.recipient_key_mode
       API_GATEWAY_ENDPOINT = var.api_gateway_endpoint
     }, var.additional_environment_variables)
   }
@@ -23,6 +23,16 @@ output "dynamodb_table_arn" {
   value       = local.effective_table_arn
 }
 
+output "connection_id_index_name" {
+  description = "Name of the DynamoDB GSI keyed by connection_id"
+  value       = var.connection_id_index_name
+}
+
+output "type_key_index_name" {
+  description = "Name of the DynamoDB GSI keyed by booking_id + type_key"
+  value       = var.type_key_index_name
+}
+
 output "lambda_role_arn" {
   description = "ARN of the Lambda execution role"
   value       = local.effective_role_arn
@@ -9,11 +9,40 @@ variable "connections_table_name" {
   default     = "websocket-connections"
 }
 
+variable "connection_id_index_name" {
+  description = "Name of the DynamoDB global secondary index keyed by connection_id (used for metadata lookup and disconnect cleanup)"
+  type        = string
+  default     = "connection_id-index"
+}
+
+variable "type_key_index_name" {
+  description = "Name of the DynamoDB global secondary index keyed by booking_id + type_key (used for recipient lookups)"
+  type        = string
+  default     = "type_key-index"
+}
+
+variable "recipient_key_mode" {
+  description = "Recipient lookup mode: legacy (filtered base-table query, finds rows without type_key) or typed (type_key index only - switch once every live row carries type_key)"
+  type        = string
+  default     = "legacy"
+
+  validation {
+    condition     = contains(["legacy", "typed"], var.recipient_key_mode)
+    error_message = "recipient_key_mode must be one of: legacy, typed."
+  }
+}
+
 variable "lambda_source_file" {
   description = "Path to the Lambda function source file"
   type        = string
 }
 
+variable "lambda_source_dir" {
+  description = "Path to a bundle directory built by lambda/tools/build_bundle.py. When set it is zipped instead of lambda_source_file"
+  type        = string
+  default     = null
+}
+
 variable "lambda_requirements_file" {
   description = "Path to requirements.txt file for Lambda dependencies (optional, will use defaults if not provided)"
   type        = string